@@ -1,4 +1,5 @@
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -31,12 +32,14 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
 
     #local app
-    'core',
+    'core.apps.CoreConfig',
     'user',
     'recipe',
 ]
 
 MIDDLEWARE = [
+    # Keep first, health probes are answered without the rest of the stack
+    'core.middleware.HealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,6 +49,55 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# API workers only authenticate with tokens and render JSON, so the
+# 'api' profile drops the session, CSRF, messages and admin machinery.
+# The default 'admin' profile keeps everything for the admin site.
+DJANGO_PROFILE = os.environ.get('DJANGO_PROFILE', 'admin')
+
+REST_FRAMEWORK = {
+    # Sliding window rates used by core.throttling, keyed by
+    # '<throttle_scope>_<user|ip|account>'
+    'DEFAULT_THROTTLE_RATES': {
+        'signup_ip': os.environ.get('THROTTLE_SIGNUP_IP', '20/hour'),
+        'login_ip': os.environ.get('THROTTLE_LOGIN_IP', '60/min'),
+        'login_account': os.environ.get('THROTTLE_LOGIN_ACCOUNT', '10/min'),
+        'recipe_write_user': os.environ.get(
+            'THROTTLE_RECIPE_WRITE_USER', '120/min'
+        ),
+        'recipe_write_ip': os.environ.get(
+            'THROTTLE_RECIPE_WRITE_IP', '600/min'
+        ),
+    },
+}
+THROTTLE_CACHE = 'default'
+
+if DJANGO_PROFILE == 'api':
+    API_ONLY_EXCLUDED = {
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    }
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS if app not in API_ONLY_EXCLUDED
+    ]
+    MIDDLEWARE = [
+        item for item in MIDDLEWARE if item not in API_ONLY_EXCLUDED
+    ]
+    REST_FRAMEWORK.update({
+        'DEFAULT_AUTHENTICATION_CLASSES': [
+            'core.authentication.ExpiringTokenAuthentication',
+        ],
+        'DEFAULT_RENDERER_CLASSES': [
+            'rest_framework.renderers.JSONRenderer',
+        ],
+    })
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -64,6 +116,11 @@ TEMPLATES = [
     },
 ]
 
+if DJANGO_PROFILE == 'api':
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove(
+        'django.contrib.messages.context_processors.messages'
+    )
+
 WSGI_APPLICATION = 'app.wsgi.application'
 
 
@@ -77,6 +134,58 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASSWORD'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # Keep connections open between requests instead of paying the
+        # TCP + auth handshake on every request. Django drops a persistent
+        # connection at the start/end of a request once it is older than
+        # this or after it has raised an error, which acts as our health
+        # check. Use 0 to close the connection after every request.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
+    }
+}
+
+# Set DB_PGBOUNCER=1 when connecting through pgbouncer in transaction
+# pooling mode. Server-side cursors (used by QuerySet.iterator()) do not
+# survive across transactions there.
+DB_PGBOUNCER = bool(int(os.environ.get('DB_PGBOUNCER', 0)))
+if DB_PGBOUNCER:
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Comma separated read replica hosts. Safe requests on the API views are
+# routed to a random replica, except for users who wrote something in the
+# last REPLICA_PIN_SECONDS so they always read their own writes.
+DATABASE_REPLICAS = []
+for replica_host in os.environ.get('DB_REPLICA_HOSTS', '').split(','):
+    if not replica_host.strip():
+        continue
+    alias = f'replica{len(DATABASE_REPLICAS) + 1}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=replica_host.strip(),
+        OPTIONS=dict(DATABASES['default']['OPTIONS']),
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Use a shared backend (memcached) in production so throttles, replica
+# pinning and cached results are consistent across workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
@@ -100,6 +209,67 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/3.1/topics/auth/passwords/
+# Argon2 is preferred. Existing PBKDF2 hashes, or hashes made with other
+# cost parameters, are transparently rehashed on the next successful login.
+
+PASSWORD_HASHERS = [
+    'core.hashers.TunableArgon2PasswordHasher',
+    'core.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+# In KiB
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 512))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 2))
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 216000))
+
+# Password checks on login run on a bounded thread pool per process.
+# Logins beyond LOGIN_POOL_WORKERS + LOGIN_POOL_QUEUE pending checks are
+# rejected with 429 and a Retry-After of LOGIN_POOL_RETRY_AFTER seconds.
+# Each pending login holds a request thread while it waits, so keep
+# LOGIN_POOL_WORKERS + LOGIN_POOL_QUEUE well below the server's threads
+# per process. By default logins are shed as soon as every worker is busy.
+LOGIN_POOL_WORKERS = int(os.environ.get('LOGIN_POOL_WORKERS', 2))
+LOGIN_POOL_QUEUE = int(os.environ.get('LOGIN_POOL_QUEUE', 0))
+LOGIN_POOL_RETRY_AFTER = int(os.environ.get('LOGIN_POOL_RETRY_AFTER', 1))
+
+# Auth tokens expire after AUTH_TOKEN_TTL seconds. Every login gets its own
+# database token. With AUTH_TOKEN_MODE=signed, stateless HMAC signed tokens
+# are issued instead, their revocations are kept in the database. The
+# first signing key signs, all of them verify.
+AUTH_TOKEN_MODE = os.environ.get('AUTH_TOKEN_MODE', 'database')
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 7 * 24 * 3600))
+AUTH_TOKEN_SIGNING_KEYS = [
+    key for key in os.environ.get('AUTH_TOKEN_SIGNING_KEYS', '').split(',')
+    if key
+] or [SECRET_KEY]
+
+TESTING = sys.argv[1:2] == ['test']
+
+# Background tasks (core.taskqueue), run by the run_worker command. In
+# eager mode, used by the test suite, delay() runs the task inline.
+TASKS_EAGER = bool(int(os.environ.get('TASKS_EAGER', TESTING)))
+TASKS_RETRY_DELAY = int(os.environ.get('TASKS_RETRY_DELAY', 10))
+TASKS_MAX_RETRY_DELAY = int(os.environ.get('TASKS_MAX_RETRY_DELAY', 3600))
+TASKS_RUNNING_TIMEOUT = int(os.environ.get('TASKS_RUNNING_TIMEOUT', 3600))
+
+if TESTING:
+    # Hashing cost only slows the test suite down
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    # Pool threads cannot see the data of a TestCase transaction, logins
+    # run inline except in user.tests.test_login_pool
+    LOGIN_POOL_WORKERS = 0
+    # Stand-in replica for core.tests.test_routers. Deliberately not a
+    # mirror, so the tests can tell which database a read went to
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+    }
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.1/topics/i18n/
 
@@ -121,6 +291,77 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/vol/web/media'
+
+# Uploads are stored under MEDIA_ROOT, or with FILE_STORAGE=s3 in an S3
+# compatible bucket (AWS_S3_ENDPOINT_URL points at minio and the like).
+# boto3 streams large files as multipart uploads.
+FILE_STORAGE = os.environ.get('FILE_STORAGE', 'local')
+if FILE_STORAGE == 's3':
+    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME')
+AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL')
+AWS_S3_REGION_NAME = os.environ.get('AWS_S3_REGION_NAME')
+AWS_DEFAULT_ACL = None
+AWS_S3_FILE_OVERWRITE = False
+AWS_QUERYSTRING_EXPIRE = int(os.environ.get('AWS_QUERYSTRING_EXPIRE', 3600))
+
+# Pre-signed direct uploads to the bucket
+DIRECT_UPLOAD_MAX_SIZE = int(
+    os.environ.get('DIRECT_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+)
+DIRECT_UPLOAD_EXPIRES = int(os.environ.get('DIRECT_UPLOAD_EXPIRES', 900))
+
+# Hand media downloads to the front end server after the access check:
+# 'nginx' sends X-Accel-Redirect to MEDIA_ACCEL_PREFIX (an internal
+# location aliased to MEDIA_ROOT), 'apache' sends X-Sendfile. Empty
+# streams the file from Django.
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', '')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
 STATIC_ROOT = '/vol/web/static'
 
 AUTH_USER_MODEL = 'core.user'
+
+# Soft deleted rows are kept this many seconds before purge_deleted
+# removes them, so sync clients can still see the deletion
+SOFT_DELETE_RETENTION = int(
+    os.environ.get('SOFT_DELETE_RETENTION', 30 * 24 * 3600)
+)
+
+# How long /readyz reuses the result of its dependency checks
+HEALTH_CHECK_CACHE_SECONDS = float(
+    os.environ.get('HEALTH_CHECK_CACHE_SECONDS', 2)
+)
+
+# Incremental sync: rows changed in the last SYNC_SETTLE_SECONDS are held
+# back so transactions that commit out of order are not skipped
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 500))
+SYNC_SETTLE_SECONDS = float(os.environ.get('SYNC_SETTLE_SECONDS', 2))
+
+# Recipe statistics are cached per user until their recipes change
+RECIPE_STATS_CACHE_SECONDS = int(
+    os.environ.get('RECIPE_STATS_CACHE_SECONDS', 3600)
+)
+
+# Similar recipe indexes are kept in process for this many users, and
+# fully rebuilt after SIMILARITY_INDEX_TTL seconds
+SIMILARITY_CACHE_USERS = int(os.environ.get('SIMILARITY_CACHE_USERS', 32))
+SIMILARITY_INDEX_TTL = int(os.environ.get('SIMILARITY_INDEX_TTL', 300))
+
+# Recipe admin bulk actions run in batches of ADMIN_BULK_BATCH_SIZE, each
+# in its own transaction. Larger selections than ADMIN_BULK_SYNC_LIMIT are
+# queued as a background task, its progress is shown in the task admin
+ADMIN_BULK_BATCH_SIZE = int(os.environ.get('ADMIN_BULK_BATCH_SIZE', 500))
+ADMIN_BULK_SYNC_LIMIT = int(os.environ.get('ADMIN_BULK_SYNC_LIMIT', 2000))
+
+# Public recipes are served with Cache-Control: public so CDNs and shared
+# caches can keep them, tagged with Surrogate-Key headers. After a write
+# the dotted path in PUBLIC_CACHE_PURGE, if set, is called in a task with
+# the list of keys to purge. The most requested recipes are also kept in
+# process for a few seconds.
+PUBLIC_CACHE_MAX_AGE = int(os.environ.get('PUBLIC_CACHE_MAX_AGE', 60))
+PUBLIC_CACHE_S_MAXAGE = int(os.environ.get('PUBLIC_CACHE_S_MAXAGE', 86400))
+PUBLIC_CACHE_PURGE = os.environ.get('PUBLIC_CACHE_PURGE')
+PUBLIC_HOT_CACHE_SIZE = int(os.environ.get('PUBLIC_HOT_CACHE_SIZE', 256))
+PUBLIC_HOT_CACHE_SECONDS = float(
+    os.environ.get('PUBLIC_HOT_CACHE_SECONDS', 5)
+)
@@ -1,11 +1,22 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
-from django.conf.urls.static import static
 from django.conf import settings
 
+from core.media import MediaView
+
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/v1/user/', include('user.urls')),
     path('api/v1/recipe/', include('recipe.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path(
+        settings.MEDIA_URL.lstrip('/') + '<path:path>',
+        MediaView.as_view(),
+        name='media',
+    ),
+]
+
+# The admin is not installed on API-only workers
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
@@ -1,14 +1,23 @@
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext as _
 # It will help to use more than one language in future
 
-from core import models
+from core import bulk, models, tasks
+from core.paginators import EstimatedCountPaginator
 
 
 class UserAdmin(BaseUserAdmin):
     ordering = ['id']
     list_display = ['email', 'name']
+    # Prefix searches, served by the UPPER(...) pattern indexes
+    search_fields = ['^email', '^name']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (None, {'fields': ('email', 'password',)}),
         (_('personal Info'), {'fields': ('name',)}),
@@ -32,7 +41,214 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class DeletedListFilter(admin.SimpleListFilter):
+    '''Show live rows unless deleted or all rows are asked for'''
+    title = _('deleted')
+    parameter_name = 'deleted'
+    default = 'no'
+
+    def lookups(self, request, model_admin):
+        return (('no', _('No')), ('yes', _('Yes')), ('all', _('All')))
+
+    def value(self):
+        return super().value() or self.default
+
+    def choices(self, changelist):
+        # The default choice is selected rather than an "All" without a
+        # parameter, which would show the default rows
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == lookup,
+                'query_string': changelist.get_query_string(
+                    {self.parameter_name: lookup}
+                ),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        if self.value() in ('no', 'yes'):
+            return queryset.filter(deleted_at__isnull=self.value() == 'no')
+
+        return queryset
+
+
+class SoftDeleteAdmin(admin.ModelAdmin):
+    '''Admin for soft deleted models that stays fast on large tables.
+
+    The changelist shows live rows by default, using the deleted_at
+    index, and deleted or all rows through the deleted filter. The counts
+    of the default listing and of all rows come from the table statistics
+    on large tables. A second COUNT(*) for the full result count is never
+    run. Users are picked by id rather than from a select
+    listing all of them.
+    '''
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_select_related = ('user', )
+    list_filter = (DeletedListFilter, )
+    raw_id_fields = ('user', )
+    readonly_fields = ('deleted_at', )
+
+    def get_queryset(self, request):
+        queryset = self.model.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+
+        return queryset
+
+
+class RecipeAttrAdmin(SoftDeleteAdmin):
+    list_display = ('name', 'user', 'deleted_at')
+    search_fields = ('^name', )
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, use_distinct = super().get_search_results(
+            request, queryset, search_term
+        )
+        # Deleted tags and ingredients cannot be added to recipes
+        if request.path.endswith('/autocomplete/'):
+            queryset = queryset.filter(deleted_at__isnull=True)
+
+        return queryset, use_distinct
+
+
+class RecipeActionForm(ActionForm):
+    tag_name = forms.CharField(label=_('Tag'), required=False,
+                               max_length=255)
+    user_email = forms.EmailField(label=_('User email'), required=False)
+
+
+class RecipeAdmin(SoftDeleteAdmin):
+    '''Recipe admin with bulk actions that run in batches of set based
+    queries rather than loading the selected recipes, see core.bulk.
+    Selections over ADMIN_BULK_SYNC_LIMIT recipes are queued as a task.
+    '''
+    list_display = (
+        'title', 'user', 'time_minutes', 'price_of_ingredient', 'is_public',
+        'deleted_at',
+    )
+    search_fields = ('^title', )
+    autocomplete_fields = ('tags', 'ingredients')
+    action_form = RecipeActionForm
+    actions = (
+        'bulk_delete', 'bulk_add_tag', 'bulk_remove_tag', 'bulk_reassign',
+    )
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Collects every selected recipe and its relations, use bulk_delete
+        actions.pop('delete_selected', None)
+        return actions
+
+    def _run_bulk(self, request, queryset, action, **params):
+        '''Run the action inline and return its result, or queue it and
+        return None'''
+        recipe_ids = list(queryset.values_list('pk', flat=True))
+        if (len(recipe_ids) > settings.ADMIN_BULK_SYNC_LIMIT
+                and not settings.TASKS_EAGER):
+            queued = tasks.bulk_recipe_action.delay(
+                action, recipe_ids, **params
+            )
+            self.message_user(request, _(
+                'Queued %(count)d recipes as task %(task)d, see the tasks '
+                'page for its progress.'
+            ) % {'count': len(recipe_ids), 'task': queued.pk})
+            return None
+
+        return bulk.ACTIONS[action](recipe_ids, **params)
+
+    def _tag_name(self, request):
+        name = request.POST.get('tag_name', '').strip()
+        if not name:
+            self.message_user(
+                request, _('Enter the name of a tag.'), messages.ERROR
+            )
+        return name
+
+    def bulk_delete(self, request, queryset):
+        deleted = self._run_bulk(request, queryset, 'delete')
+        if deleted is not None:
+            self.message_user(
+                request, _('Deleted %d recipes.') % deleted
+            )
+    bulk_delete.short_description = _('Delete selected recipes')
+    bulk_delete.allowed_permissions = ('delete', )
+
+    def bulk_add_tag(self, request, queryset):
+        name = self._tag_name(request)
+        if not name:
+            return
+        tagged = self._run_bulk(request, queryset, 'add_tag', name=name)
+        if tagged is not None:
+            self.message_user(
+                request, _('Tagged %d recipes.') % tagged
+            )
+    bulk_add_tag.short_description = _('Add tag to selected recipes')
+    bulk_add_tag.allowed_permissions = ('change', )
+
+    def bulk_remove_tag(self, request, queryset):
+        name = self._tag_name(request)
+        if not name:
+            return
+        untagged = self._run_bulk(request, queryset, 'remove_tag', name=name)
+        if untagged is not None:
+            self.message_user(
+                request, _('Untagged %d recipes.') % untagged
+            )
+    bulk_remove_tag.short_description = _('Remove tag from selected recipes')
+    bulk_remove_tag.allowed_permissions = ('change', )
+
+    def bulk_reassign(self, request, queryset):
+        email = request.POST.get('user_email', '').strip()
+        user = get_user_model().objects.filter(email__iexact=email).first()
+        if user is None:
+            self.message_user(
+                request, _('Enter the email of an existing user.'),
+                messages.ERROR
+            )
+            return
+        result = self._run_bulk(
+            request, queryset, 'reassign', user_id=user.pk
+        )
+        if result is not None:
+            self.message_user(request, _(
+                'Moved %(moved)d recipes, skipped %(skipped)d whose title '
+                'the user already has.'
+            ) % {'moved': result[0], 'skipped': result[1]})
+    bulk_reassign.short_description = _('Move selected recipes to user')
+    bulk_reassign.allowed_permissions = ('change', )
+
+
+class TaskAdmin(admin.ModelAdmin):
+    '''Read only view of the task queue'''
+    list_display = (
+        'id', 'name', 'status', 'progress_display', 'attempts', 'run_at',
+        'updated_at',
+    )
+    list_filter = ('status', )
+    ordering = ('-id', )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def progress_display(self, obj):
+        if obj.progress_total is None:
+            return '-'
+        return f'{obj.progress}/{obj.progress_total}'
+    progress_display.short_description = _('progress')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
+admin.site.register(models.Tag, RecipeAttrAdmin)
+admin.site.register(models.Ingredient, RecipeAttrAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.Task, TaskAdmin)
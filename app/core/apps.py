@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Connect the signal handlers
+        from core import signals  # noqa: F401
+
+        # Register the background tasks of every app
+        autodiscover_modules('tasks')
@@ -0,0 +1,114 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import Exists
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.models import AuthToken, RevokedToken
+
+
+SIGNED_TOKEN_SALT = 'core.authentication.signed-token'
+
+
+def issue_token(user):
+    '''Return a (key, expires_at) auth token pair for the user.
+
+    In 'signed' mode the token is stateless. Otherwise every login gets
+    its own database token, so logging in on one device leaves the
+    others logged in. The user's expired tokens are dropped meanwhile.
+    '''
+    now = timezone.now()
+    ttl = timedelta(seconds=settings.AUTH_TOKEN_TTL)
+    if settings.AUTH_TOKEN_MODE == 'signed':
+        payload = {'u': user.pk, 'j': uuid.uuid4().hex}
+        key = signing.dumps(
+            payload,
+            key=settings.AUTH_TOKEN_SIGNING_KEYS[0],
+            salt=SIGNED_TOKEN_SALT,
+        )
+        return key, now + ttl
+
+    AuthToken.objects.filter(user=user, created__lte=now - ttl).delete()
+    token = AuthToken.objects.create(user=user, created=now)
+
+    return token.key, now + ttl
+
+
+def load_signed_token(key):
+    '''Return the payload of a signed token, trying every signing key so
+    keys can be rotated without logging everybody out'''
+    for signing_key in settings.AUTH_TOKEN_SIGNING_KEYS:
+        try:
+            return signing.loads(
+                key,
+                key=signing_key,
+                salt=SIGNED_TOKEN_SALT,
+                max_age=settings.AUTH_TOKEN_TTL,
+            )
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        except signing.BadSignature:
+            continue
+
+    raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+
+def revoke_token(auth):
+    '''Revoke the token the request was authenticated with'''
+    if isinstance(auth, AuthToken):
+        auth.delete()
+    else:
+        # Kept in the database so every process sees it, and only until
+        # the token would have expired anyway
+        RevokedToken.objects.bulk_create([RevokedToken(
+            jti=auth['j'],
+            expires_at=timezone.now() + timedelta(
+                seconds=settings.AUTH_TOKEN_TTL
+            ),
+        )], ignore_conflicts=True)
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    '''Token authentication accepting expiring database tokens and signed
+    tokens, which are verified without a token lookup'''
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        # Database token keys are hex, signed tokens contain separators
+        if ':' in key:
+            return self.authenticate_signed(key)
+
+        user, token = super().authenticate_credentials(key)
+        expires_at = token.created + timedelta(
+            seconds=settings.AUTH_TOKEN_TTL
+        )
+        if expires_at <= timezone.now():
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+
+        return user, token
+
+    def authenticate_signed(self, key):
+        payload = load_signed_token(key)
+        # The revocation check rides along with the user query
+        revoked = RevokedToken.objects.filter(jti=payload['j'])
+        try:
+            user = get_user_model()._default_manager.annotate(
+                token_revoked=Exists(revoked)
+            ).get(pk=payload['u'])
+        except get_user_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if user.token_revoked:
+            raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        return user, payload
@@ -0,0 +1,152 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from django.contrib.auth.hashers import MD5PasswordHasher
+from django.core.signals import request_finished, request_started
+from django.db import connection
+
+from core.hashers import TunableArgon2PasswordHasher, \
+                         TunablePBKDF2PasswordHasher
+from core.similarity import SimilarityIndex
+
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    '''Register a function to be run by the benchmark command'''
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def _timed(func, iterations):
+    '''Return the average run time of func in milliseconds'''
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def _fake_request():
+    '''Run a trivial query wrapped in the request lifecycle signals'''
+    request_started.send(sender=None)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    request_finished.send(sender=None)
+
+
+@benchmark
+def db_connections(iterations):
+    '''Compare per-request latency with and without persistent connections'''
+    results = {}
+    original = connection.settings_dict['CONN_MAX_AGE']
+    try:
+        for max_age in (0, 60):
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = max_age
+            results[f'CONN_MAX_AGE={max_age}'] = _timed(
+                _fake_request, iterations
+            )
+    finally:
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = original
+
+    return {name: f'{ms:.3f} ms/request' for name, ms in results.items()}
+
+
+# Runs in a fresh interpreter so each profile pays its own startup cost
+PROFILE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.test import Client
+from django.urls import reverse
+client = Client(HTTP_HOST='localhost')
+client.get('/healthz')
+startup = time.perf_counter() - start
+url = reverse('recipe:tag-list')
+iterations = int(sys.argv[1])
+start = time.perf_counter()
+for _ in range(iterations):
+    client.get(url)
+request = (time.perf_counter() - start) / iterations
+print(json.dumps({'startup': startup, 'request': request}))
+"""
+
+
+@benchmark
+def settings_profiles(iterations):
+    '''Compare startup time and per-request overhead of the admin and
+    API-only settings profiles'''
+    results = {}
+    for profile in ('admin', 'api'):
+        env = dict(os.environ, DJANGO_PROFILE=profile)
+        output = subprocess.run(
+            [sys.executable, '-c', PROFILE_SCRIPT, str(iterations)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        timings = json.loads(output.splitlines()[-1])
+        results[f'{profile} startup'] = f'{timings["startup"] * 1000:.1f} ms'
+        results[f'{profile} request'] = (
+            f'{timings["request"] * 1000:.3f} ms/request'
+        )
+
+    return results
+
+
+@benchmark
+def password_hashers(iterations):
+    '''Measure password verifications (logins) per second on one core
+    for every hasher configuration'''
+    results = {}
+    for name, hasher in (
+        ('argon2', TunableArgon2PasswordHasher()),
+        ('pbkdf2_sha256', TunablePBKDF2PasswordHasher()),
+        ('md5 (test suite)', MD5PasswordHasher()),
+    ):
+        encoded = hasher.encode('correct horse', hasher.salt())
+
+        def verify():
+            hasher.verify('correct horse', encoded)
+
+        # Slow hashers get fewer rounds, about half a second each
+        rounds = max(1, min(iterations, int(500 / _timed(verify, 1))))
+        ms = _timed(verify, rounds)
+        results[name] = f'{1000 / ms:.0f} logins/s/core ({ms:.2f} ms)'
+
+    return results
+
+
+@benchmark
+def similar_recipes(iterations):
+    '''Measure building a similarity index over 50k synthetic recipes
+    and ranking the most similar recipes with it'''
+    rng = random.Random(0)
+    rows = {
+        pk: frozenset(rng.sample(range(4000), rng.randint(3, 15)))
+        for pk in range(1, 50001)
+    }
+    start = time.perf_counter()
+    index = SimilarityIndex.build(rows, stamp=None)
+    build = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    index.updated({1: frozenset({1, 2, 3}), 2: None}, stamp=None)
+    update = (time.perf_counter() - start) * 1000
+    results = {
+        'build 50k recipes': f'{build:.1f} ms',
+        'update 2 recipes': f'{update:.1f} ms',
+    }
+
+    for metric in ('jaccard', 'cosine'):
+        def query():
+            index.similar(rng.randint(1, 50000), metric, 10)
+
+        results[f'{metric} query'] = f'{_timed(query, iterations):.2f} ms'
+
+    return results
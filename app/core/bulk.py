@@ -0,0 +1,198 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core import cooccurrence, surrogate
+from core.models import Ingredient, Recipe, Tag
+from core.summaries import refresh_summaries
+
+
+def batches(ids, size=None):
+    '''Split ids into lists of at most size (ADMIN_BULK_BATCH_SIZE)'''
+    ids = list(ids)
+    size = size or settings.ADMIN_BULK_BATCH_SIZE
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _run(recipe_ids, apply, progress=None):
+    '''Call apply(batch) for each batch of recipe_ids, each batch in its
+    own transaction, and return the summed results. progress(done, total)
+    is called after each batch'''
+    recipe_ids = list(recipe_ids)
+    total = done = 0
+    for batch in batches(recipe_ids):
+        with transaction.atomic():
+            total += apply(batch)
+        done += len(batch)
+        if progress is not None:
+            progress(done, len(recipe_ids))
+
+    return total
+
+
+def _owner_attrs(model, user_id, names, cache):
+    '''Return {name: id} of the user's tags or ingredients with the given
+    names, creating the missing ones'''
+    user = get_user_model()(pk=user_id)
+    for name in names:
+        if (user_id, name) not in cache:
+            obj, _ = model.objects.upsert(('user', 'name'), user=user,
+                                          name=name)
+            cache[user_id, name] = obj.pk
+
+    return {name: cache[user_id, name] for name in names}
+
+
+def _changed(recipe_ids):
+    '''Bump the version of recipes whose tags changed and refresh their
+    summaries, so a client holding the old version gets a 412 on If-Match
+    rather than silently reverting the change'''
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        version=F('version') + 1
+    )
+    refresh_summaries(recipe_ids)
+
+
+def delete_recipes(recipe_ids, progress=None):
+    '''Soft delete recipes with one UPDATE per batch. Returns the number
+    of recipes deleted'''
+    def apply(batch):
+        recipes = dict(
+            Recipe.objects.filter(pk__in=batch).values_list('pk', 'is_public')
+        )
+        batch = list(recipes)
+        # Queryset deletes send no signals, uncount the pairs here
+        cooccurrence.recipes_removed(batch)
+        deleted = Recipe.objects.filter(pk__in=batch).delete()
+        surrogate.recipes_changed(batch, was_public=[
+            pk for pk, is_public in recipes.items() if is_public
+        ])
+        return deleted
+
+    return _run(recipe_ids, apply, progress)
+
+
+def add_tag(recipe_ids, name, progress=None):
+    '''Tag recipes with the tag called name of their owner, created if
+    needed. Returns the number of recipes newly tagged'''
+    through = Recipe.tags.through
+    tags = {}
+
+    def apply(batch):
+        owners = dict(
+            Recipe.objects.filter(pk__in=batch).values_list('pk', 'user_id')
+        )
+        links = [
+            through(
+                recipe_id=recipe_id,
+                tag_id=_owner_attrs(Tag, user_id, [name], tags)[name],
+            )
+            for recipe_id, user_id in owners.items()
+        ]
+        existing = set(through.objects.filter(
+            recipe_id__in=owners, tag_id__in={link.tag_id for link in links}
+        ).values_list('recipe_id', flat=True))
+        links = [link for link in links if link.recipe_id not in existing]
+        through.objects.bulk_create(links, ignore_conflicts=True)
+        tagged = [link.recipe_id for link in links]
+        _changed(tagged)
+        return len(tagged)
+
+    return _run(recipe_ids, apply, progress)
+
+
+def remove_tag(recipe_ids, name, progress=None):
+    '''Remove the tags called name from recipes. Returns the number of
+    recipes untagged'''
+    through = Recipe.tags.through
+
+    def apply(batch):
+        links = through.objects.filter(
+            recipe_id__in=batch,
+            recipe__deleted_at__isnull=True,
+            tag__name=name,
+        )
+        untagged = set(links.values_list('recipe_id', flat=True))
+        links.delete()
+        _changed(untagged)
+        return len(untagged)
+
+    return _run(recipe_ids, apply, progress)
+
+
+def reassign_recipes(recipe_ids, user_id, progress=None):
+    '''Move recipes to another user.
+
+    Tags and ingredients belong to a user, so they are replaced with the
+    new owner's ones of the same name, created if needed. Recipes whose
+    title the new owner already uses are skipped. The previous owners'
+    sync cursors are invalidated, as the moved recipes leave no deleted
+    row behind for their feed. Returns (moved, skipped).
+    '''
+    attrs = {}
+    skipped = 0
+
+    def relink(model, field, batch):
+        through = getattr(Recipe, f'{field}s').through
+        links = list(through.objects.filter(
+            recipe_id__in=batch, **{f'{field}__deleted_at__isnull': True}
+        ).values_list('recipe_id', f'{field}__name'))
+        ids = _owner_attrs(
+            model, user_id, {name for _, name in links}, attrs
+        )
+        through.objects.filter(recipe_id__in=batch).delete()
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, **{f'{field}_id': ids[name]})
+            for recipe_id, name in links
+        ], ignore_conflicts=True)
+
+    def apply(batch):
+        nonlocal skipped
+        recipes = list(
+            Recipe.objects.filter(pk__in=batch).exclude(
+                user_id=user_id
+            ).values_list('pk', 'title')
+        )
+        taken = set(Recipe.objects.filter(
+            user_id=user_id, title__in=[title for _, title in recipes]
+        ).values_list('title', flat=True))
+        moved = []
+        for recipe_id, title in recipes:
+            if title in taken:
+                skipped += 1
+                continue
+            taken.add(title)
+            moved.append(recipe_id)
+
+        now = timezone.now()
+        previous_owners = set(Recipe.objects.filter(
+            pk__in=moved
+        ).values_list('user_id', flat=True))
+        cooccurrence.recipes_removed(moved)
+        relink(Tag, 'tag', moved)
+        relink(Ingredient, 'ingredient', moved)
+        Recipe.objects.filter(pk__in=moved).update(
+            user_id=user_id,
+            version=F('version') + 1,
+            updated_at=now,
+        )
+        get_user_model().objects.filter(pk__in=previous_owners).update(
+            sync_reset_at=now
+        )
+        cooccurrence.recipes_added(moved)
+        surrogate.recipes_changed(moved)
+        return len(moved)
+
+    moved = _run(recipe_ids, apply, progress)
+    return moved, skipped
+
+
+ACTIONS = {
+    'delete': delete_recipes,
+    'add_tag': add_tag,
+    'remove_tag': remove_tag,
+    'reassign': reassign_recipes,
+}
@@ -0,0 +1,114 @@
+from collections import Counter
+from itertools import permutations
+
+from django.db import connections, router, transaction
+
+from core.models import IngredientPair, Recipe
+
+
+def _recipe_ingredients(recipe_ids, live_only=True):
+    '''Return {recipe_id: (user_id, {ingredient_id, ...})}'''
+    rows = Recipe.ingredients.through.objects.filter(
+        recipe_id__in=recipe_ids
+    )
+    if live_only:
+        rows = rows.filter(recipe__deleted_at__isnull=True)
+
+    recipes = {}
+    for recipe_id, user_id, ingredient_id in rows.values_list(
+            'recipe_id', 'recipe__user_id', 'ingredient_id'):
+        recipes.setdefault(recipe_id, (user_id, set()))[1].add(ingredient_id)
+
+    return recipes
+
+
+def _count_pairs(recipes, before, after):
+    '''Count the ingredient pairs in after(ids) that are not in
+    before(ids), over all recipes'''
+    counts = Counter()
+    for user_id, ingredient_ids in recipes.values():
+        pairs = set(permutations(after(ingredient_ids), 2)) - set(
+            permutations(before(ingredient_ids), 2)
+        )
+        counts.update(
+            (user_id, ingredient_id, other_id)
+            for ingredient_id, other_id in pairs
+        )
+
+    return counts
+
+
+def ingredients_added(recipe_ids, ingredient_ids):
+    '''Count the pairs formed by adding ingredient_ids to the recipes'''
+    added = set(ingredient_ids)
+    IngredientPair.objects.add_counts(_count_pairs(
+        _recipe_ingredients(recipe_ids),
+        before=lambda ids: ids - added,
+        after=lambda ids: ids,
+    ))
+
+
+def ingredients_removed(recipe_ids, ingredient_ids):
+    '''Uncount the pairs broken by removing ingredient_ids from the
+    recipes'''
+    removed = set(ingredient_ids)
+    recipes = _recipe_ingredients(recipe_ids)
+    # A recipe left with no ingredients has no through rows any more
+    user_ids = dict(
+        Recipe.objects.filter(pk__in=recipe_ids).values_list('pk', 'user_id')
+    )
+    for recipe_id, user_id in user_ids.items():
+        recipes.setdefault(recipe_id, (user_id, set()))
+
+    IngredientPair.objects.subtract_counts(_count_pairs(
+        recipes,
+        before=lambda ids: ids,
+        after=lambda ids: ids | removed,
+    ))
+
+
+def recipe_removed(recipe_id):
+    '''Uncount all pairs of a recipe that is being deleted'''
+    recipes_removed([recipe_id])
+
+
+def recipes_removed(recipe_ids):
+    '''Uncount all pairs of recipes that are being deleted or moved to
+    another user'''
+    IngredientPair.objects.subtract_counts(_count_pairs(
+        _recipe_ingredients(recipe_ids, live_only=False),
+        before=lambda ids: (),
+        after=lambda ids: ids,
+    ))
+
+
+def recipes_added(recipe_ids):
+    '''Count all pairs of live recipes that were moved to another user'''
+    IngredientPair.objects.add_counts(_count_pairs(
+        _recipe_ingredients(recipe_ids),
+        before=lambda ids: (),
+        after=lambda ids: ids,
+    ))
+
+
+def rebuild(user_id):
+    '''Recompute all pair counts of a user with one grouped query'''
+    db = router.db_for_write(IngredientPair)
+    connection = connections[db]
+    quote = connection.ops.quote_name
+    through = quote(Recipe.ingredients.through._meta.db_table)
+    sql = (
+        f'INSERT INTO {quote(IngredientPair._meta.db_table)} '
+        f'(user_id, ingredient_id, other_id, {quote("count")}) '
+        f'SELECT r.user_id, a.ingredient_id, b.ingredient_id, COUNT(*) '
+        f'FROM {through} a '
+        f'JOIN {through} b ON b.recipe_id = a.recipe_id '
+        f'AND b.ingredient_id <> a.ingredient_id '
+        f'JOIN {quote(Recipe._meta.db_table)} r ON r.id = a.recipe_id '
+        f'WHERE r.user_id = %s AND r.deleted_at IS NULL '
+        f'GROUP BY r.user_id, a.ingredient_id, b.ingredient_id'
+    )
+    with transaction.atomic(using=db):
+        IngredientPair.objects.using(db).filter(user_id=user_id).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id])
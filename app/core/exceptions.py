@@ -0,0 +1,12 @@
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = _(
+        'The resource has been modified, fetch it again and retry.'
+    )
+    default_code = 'precondition_failed'
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, \
+                                        PBKDF2PasswordHasher
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    '''Argon2 hasher with cost parameters read from the settings.
+    Hashes made with other parameters are upgraded on the next login'''
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    '''PBKDF2 hasher with the iteration count read from the settings'''
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.http import JsonResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+_lock = threading.Lock()
+_readiness = None  # (expires_at, status_code, payload)
+
+
+def check_database():
+    with connections['default'].cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def check_cache():
+    cache.set('readyz', 'ok', 10)
+    if cache.get('readyz') != 'ok':
+        raise RuntimeError('cache did not return the stored value')
+
+
+def check_media():
+    '''Write and remove a file through the storage backend in use, local
+    or object storage'''
+    name = default_storage.save(
+        f'readyz/{uuid.uuid4().hex}', ContentFile(b'ok')
+    )
+    default_storage.delete(name)
+
+
+READINESS_CHECKS = {
+    'database': check_database,
+    'cache': check_cache,
+    'media': check_media,
+}
+
+
+def clear_readiness_cache():
+    global _readiness
+    _readiness = None
+
+
+def _run_checks():
+    checks = {}
+    for name, check in READINESS_CHECKS.items():
+        try:
+            check()
+            checks[name] = 'ok'
+        except Exception:
+            # The probe is public, the error may name hosts and addresses
+            logger.exception('Readiness check %s failed', name)
+            checks[name] = 'fail'
+
+    ready = all(result == 'ok' for result in checks.values())
+    payload = {'status': 'ok' if ready else 'fail', 'checks': checks}
+    return (200 if ready else 503), payload
+
+
+def healthz(request):
+    '''Liveness probe, the process is up and serving requests'''
+    return JsonResponse({'status': 'ok'})
+
+
+def readyz(request):
+    '''Readiness probe, dependencies are reachable. Results are reused
+    for HEALTH_CHECK_CACHE_SECONDS so probe storms stay cheap'''
+    global _readiness
+    with _lock:
+        now = time.monotonic()
+        if _readiness is None or _readiness[0] <= now:
+            status, payload = _run_checks()
+            _readiness = (
+                now + settings.HEALTH_CHECK_CACHE_SECONDS, status, payload
+            )
+        _, status, payload = _readiness
+
+    return JsonResponse(payload, status=status)
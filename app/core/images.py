@@ -0,0 +1,45 @@
+import base64
+import io
+
+from PIL import Image, features
+
+
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+PALETTE_SIZE = 5
+# Pillow built without libwebp cannot write WebP, JPEG is a bit larger
+PLACEHOLDER_FORMAT, PLACEHOLDER_MIME_TYPE = (
+    ('WEBP', 'image/webp') if features.check('webp')
+    else ('JPEG', 'image/jpeg')
+)
+
+
+def compute_placeholder(fp):
+    '''Return (placeholder, color) for an image file: a tiny WebP (or JPEG)
+    data URI that clients can blur while the image loads, and the dominant
+    colour as a #rrggbb string'''
+    with Image.open(fp) as image:
+        # Lets JPEG decode straight to a reduced scale, far cheaper than
+        # decoding the full image and shrinking it
+        image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+        image = image.convert('RGB')
+        image.thumbnail((PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+
+    palette = image.quantize(colors=PALETTE_SIZE)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    color = f'#{red:02x}{green:02x}{blue:02x}'
+
+    image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    image.save(buffer, PLACEHOLDER_FORMAT, quality=PLACEHOLDER_QUALITY)
+    placeholder = f'data:{PLACEHOLDER_MIME_TYPE};base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+    return placeholder, color
+
+
+def placeholder_from_bytes(content):
+    '''compute_placeholder for raw bytes, for use in worker processes'''
+    return compute_placeholder(io.BytesIO(content))
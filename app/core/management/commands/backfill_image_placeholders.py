@@ -0,0 +1,88 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.images import placeholder_from_bytes
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    '''Django command to compute image placeholders and colours for
+    recipes that do not have them yet'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of worker processes, defaults to the CPU count',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute placeholders that are already set, and retry '
+                 'images that failed before',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            queryset = queryset.filter(
+                image_placeholder='', image_failed=False
+            )
+
+        done = failed = 0
+        last_pk = 0
+        # Decoding is CPU bound, so it runs in worker processes while this
+        # one reads the files and writes the results
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                batch = list(
+                    queryset.filter(pk__gt=last_pk).order_by('pk').only(
+                        'pk', 'image'
+                    )[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                contents = []
+                for recipe in batch:
+                    try:
+                        with recipe.image.open('rb') as fp:
+                            contents.append(fp.read())
+                    except OSError as exc:
+                        contents.append(None)
+                        self.stderr.write(f'Recipe {recipe.pk}: {exc}')
+
+                futures = [
+                    pool.submit(placeholder_from_bytes, content)
+                    if content is not None else None
+                    for content in contents
+                ]
+                for recipe, future in zip(batch, futures):
+                    if future is None:
+                        failed += 1
+                        continue
+                    try:
+                        placeholder, color = future.result()
+                    except Exception as exc:
+                        failed += 1
+                        self.stderr.write(f'Recipe {recipe.pk}: {exc}')
+                        Recipe.objects.filter(
+                            pk=recipe.pk, image=recipe.image.name
+                        ).update(image_failed=True, updated_at=timezone.now())
+                        continue
+
+                    Recipe.objects.filter(
+                        pk=recipe.pk, image=recipe.image.name
+                    ).update(
+                        image_placeholder=placeholder,
+                        image_color=color,
+                        image_failed=False,
+                        updated_at=timezone.now(),
+                    )
+                    done += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{done} placeholders computed, {failed} failed'
+        ))
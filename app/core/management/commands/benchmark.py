@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    '''Django command to run the performance benchmarks'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*',
+            help='Benchmarks to run, all of them when omitted',
+        )
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        names = options['names'] or sorted(BENCHMARKS)
+        unknown = set(names) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(
+                f'Unknown benchmarks: {", ".join(sorted(unknown))}'
+            )
+
+        for name in names:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            results = BENCHMARKS[name](options['iterations'])
+            for label, value in results.items():
+                self.stdout.write(f'  {label}: {value}')
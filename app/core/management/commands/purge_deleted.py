@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import AuthToken, Ingredient, Recipe, RevokedToken, Tag
+from core.purge import purge_recipe_attrs, purge_recipes, purge_user
+
+
+class Command(BaseCommand):
+    '''Django command to permanently remove soft deleted users, recipes,
+    tags and ingredients in bounded batches, and expired auth tokens'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Seconds to sleep between batches to limit database load',
+        )
+        parser.add_argument(
+            '--older-than', type=int, default=settings.SOFT_DELETE_RETENTION,
+            help='Only purge rows deleted at least this many seconds ago',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+        batch = {
+            'batch_size': options['batch_size'],
+            'pause': options['pause'],
+        }
+
+        users = get_user_model().objects.filter(deleted_at__lte=cutoff)
+        for user in list(users):
+            purge_user(user, **batch)
+            self.stdout.write(f'Purged user {user.pk}')
+
+        count = purge_recipes(
+            Recipe.all_objects.filter(deleted_at__lte=cutoff), **batch
+        )
+        self.stdout.write(f'Purged {count} recipes')
+        for model in (Tag, Ingredient):
+            count = purge_recipe_attrs(
+                model.all_objects.filter(deleted_at__lte=cutoff), **batch
+            )
+            self.stdout.write(
+                f'Purged {count} {model._meta.verbose_name_plural}'
+            )
+
+        now = timezone.now()
+        count, _ = AuthToken.objects.filter(
+            created__lte=now - timedelta(seconds=settings.AUTH_TOKEN_TTL)
+        ).delete()
+        count += RevokedToken.objects.filter(expires_at__lte=now).delete()[0]
+        self.stdout.write(f'Purged {count} expired tokens')
+
+        self.stdout.write(self.style.SUCCESS('Purge complete'))
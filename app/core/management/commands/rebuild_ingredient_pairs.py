@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core import cooccurrence
+
+
+class Command(BaseCommand):
+    '''Django command to recompute the ingredient co-occurrence counts'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Only rebuild this user id, can be repeated',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['users'] or list(
+            get_user_model().objects.filter(
+                deleted_at__isnull=True
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+
+        total = 0
+        for user_id in user_ids:
+            cooccurrence.rebuild(user_id)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ingredient pairs rebuilt for {total} users'
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from core.summaries import find_stale_summaries, refresh_summaries
+
+
+class Command(BaseCommand):
+    '''Django command to rebuild or check the denormalized recipe
+    tag/ingredient summary columns'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report recipes with stale summaries, '
+                 'fail if there are any',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = stale = 0
+        last_pk = 0
+        while True:
+            # Keyset pagination keeps every batch an index range scan
+            batch = list(
+                Recipe.objects.filter(pk__gt=last_pk).order_by('pk').only(
+                    'pk', 'tag_names', 'ingredient_names', 'ingredient_count'
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            total += len(batch)
+
+            if options['check']:
+                stale_ids = find_stale_summaries(batch)
+                stale += len(stale_ids)
+                for recipe_id in stale_ids:
+                    self.stdout.write(f'Recipe {recipe_id} is out of date')
+            else:
+                refresh_summaries([recipe.pk for recipe in batch])
+
+        if options['check'] and stale:
+            raise CommandError(f'{stale} of {total} recipes are out of date')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} recipes {"checked" if options["check"] else "rebuilt"}'
+        ))
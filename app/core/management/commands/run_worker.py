@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+
+from core import taskqueue
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    '''Django command to run queued background tasks'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Number of worker threads',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1,
+            help='Seconds to wait when the queue is empty',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        threads = [
+            threading.Thread(
+                target=self.work, args=(options,), name=f'worker-{n}'
+            )
+            for n in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(
+            f'Worker started with {len(threads)} threads, '
+            f'{len(taskqueue.registry)} registered tasks'
+        )
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write('Finishing running tasks...')
+            self.stopping.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
+
+    def work(self, options):
+        '''Claim and run tasks until stopped'''
+        try:
+            while not self.stopping.is_set():
+                # Drop connections that errored or outlived CONN_MAX_AGE
+                close_old_connections()
+                try:
+                    if taskqueue.run_pending(limit=10):
+                        continue
+                except DatabaseError:
+                    # Keep the worker alive through database hiccups
+                    logger.exception('Could not claim tasks')
+                    connection.close()
+                    time.sleep(options['poll_interval'])
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        finally:
+            connection.close()
@@ -1,21 +1,116 @@
+import random
 import time
 
+from django.core.cache import caches
 from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+
+class NotReady(Exception):
+    '''Raised by a readiness check that has not passed yet'''
 
 
 class Command(BaseCommand):
     '''Django command to pause execution until database is available'''
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Database alias to wait for, can be repeated '
+                 '(default: all configured databases)',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Give up after this many seconds',
+        )
+        parser.add_argument(
+            '--initial-delay', type=float, default=0.1,
+            help='First retry delay in seconds, doubled on every attempt',
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Upper bound for a single retry delay in seconds',
+        )
+        parser.add_argument(
+            '--check-migrations', action='store_true',
+            help='Also wait until all migrations are applied',
+        )
+        parser.add_argument(
+            '--check-cache', action='store_true',
+            help='Also wait until the default cache is reachable',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database... :)')
-        db_conn = None
-        while not db_conn:
-            try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+        self.options = options
+        self.deadline = time.monotonic() + options['timeout']
+        databases = options['databases'] or list(connections)
 
+        for alias in databases:
+            self.wait_until(f'Database {alias}', self.check_database, alias)
         self.stdout.write(self.style.SUCCESS('Database available!'))
+
+        if options['check_migrations']:
+            for alias in databases:
+                self.wait_until(
+                    f'Migrations on {alias}', self.check_migrations, alias
+                )
+        if options['check_cache']:
+            self.wait_until('Cache', self.check_cache)
+
+    def wait_until(self, name, check, *args):
+        '''Run check until it passes, backing off exponentially'''
+        attempt = 0
+        while True:
+            try:
+                check(*args)
+                return
+            except (OperationalError, NotReady):
+                pass
+
+            # "Full jitter" backoff, so restarting containers do not
+            # hammer the database in lockstep
+            delay = random.uniform(0, min(
+                self.options['max_delay'],
+                self.options['initial_delay'] * 2 ** attempt,
+            ))
+            if time.monotonic() + delay > self.deadline:
+                raise CommandError(
+                    f'{name} not ready after {self.options["timeout"]}s'
+                )
+            self.stdout.write(
+                f'{name} unavailable, waiting {delay:.2f} seconds...'
+            )
+            time.sleep(delay)
+            attempt += 1
+
+    def check_database(self, alias):
+        '''Open a connection and run a trivial query'''
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except OperationalError:
+            # Drop the broken connection so the next attempt reconnects
+            connection.close()
+            raise
+
+    def check_migrations(self, alias):
+        '''Fail while there are unapplied migrations'''
+        executor = MigrationExecutor(connections[alias])
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if plan:
+            raise NotReady(f'{len(plan)} unapplied migrations')
+
+    def check_cache(self):
+        '''Write and read back a value from the default cache'''
+        cache = caches['default']
+        try:
+            cache.set('wait_for_db', 'ok', 10)
+            value = cache.get('wait_for_db')
+        except Exception as exc:
+            raise NotReady(str(exc))
+        if value != 'ok':
+            raise NotReady('cache did not return the stored value')
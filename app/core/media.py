@@ -0,0 +1,196 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, \
+                        HttpResponseNotModified, HttpResponseRedirect, \
+                        StreamingHttpResponse
+from django.utils.http import http_date, quote_etag
+from django.views.static import was_modified_since
+
+from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
+
+from core import surrogate
+from core.authentication import ExpiringTokenAuthentication
+from core.mixins import ReplicaReadMixin
+from core.models import Recipe
+
+
+# Uploaded files get a fresh uuid name, so a path never changes content
+CACHE_CONTROL = 'private, max-age=31536000, immutable'
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def content_etag(full_path, stat):
+    '''Return an ETag for the file derived from its path, size and mtime.
+
+    Uploads get a fresh name and are never rewritten in place, so this
+    changes whenever the content does, without reading the file.
+    '''
+    key = '%s:%d:%d' % (full_path, stat.st_size, stat.st_mtime_ns)
+
+    return quote_etag(hashlib.sha256(key.encode()).hexdigest()[:32])
+
+
+def parse_range(header, size):
+    '''Return (start, end) for a single byte range header, None to serve
+    the whole file, or raise ValueError if it cannot be satisfied'''
+    match = RANGE_RE.match(header or '')
+    if not match or size == 0:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end or size - 1), size - 1)
+    if start > end or start >= size:
+        raise ValueError('Unsatisfiable range')
+
+    return start, end
+
+
+def read_range(f, start, end):
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+class MediaView(ReplicaReadMixin, APIView):
+    '''Serve an uploaded file to its owner, or to anyone if it belongs to
+    a public recipe.
+
+    With MEDIA_ACCEL_REDIRECT set the file is handed to the front end
+    server (nginx X-Accel-Redirect or apache X-Sendfile) after the access
+    check, otherwise it is streamed with FileResponse, which lets the WSGI
+    server use sendfile, or in parts for Range requests. Files in object
+    storage are served by redirecting to a signed URL.
+    '''
+    authentication_classes = (ExpiringTokenAuthentication, )
+    permission_classes = (AllowAny, )
+
+    def get_cache_headers(self, request, path):
+        '''Return the caching headers for the file, None if the user may
+        not see it. Images of public recipes are visible to anyone and may
+        be kept in shared caches like the public recipe endpoints, tagged
+        with the recipe's surrogate key so making it private purges them'''
+        visible = Q(is_public=True)
+        if request.user.is_authenticated:
+            visible |= Q(user=request.user)
+        recipe = Recipe.objects.filter(visible, image=path).values_list(
+            'pk', 'is_public'
+        ).order_by('-is_public').first()
+        if recipe is None:
+            return None
+
+        recipe_id, is_public = recipe
+        if not is_public:
+            return {'Cache-Control': CACHE_CONTROL}
+
+        return {
+            'Cache-Control': (
+                f'public, max-age={settings.PUBLIC_CACHE_MAX_AGE}, '
+                f's-maxage={settings.PUBLIC_CACHE_S_MAXAGE}'
+            ),
+            'Surrogate-Key': surrogate.recipe_key(recipe_id),
+        }
+
+    def get(self, request, path):
+        cache_headers = self.get_cache_headers(request, path)
+        if cache_headers is None:
+            raise Http404()
+        try:
+            full_path = default_storage.path(path)
+        except SuspiciousFileOperation:
+            raise Http404()
+        except NotImplementedError:
+            # Object storage, send the client to a short lived signed URL
+            response = HttpResponseRedirect(default_storage.url(path))
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        try:
+            stat = os.stat(full_path)
+        except (FileNotFoundError, NotADirectoryError):
+            raise Http404()
+
+        etag = content_etag(full_path, stat)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            not_modified = etag in if_none_match or if_none_match == '*'
+        else:
+            not_modified = not was_modified_since(
+                request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                stat.st_mtime,
+            )
+        if not_modified:
+            response = HttpResponseNotModified()
+        else:
+            response = self.serve(request, path, full_path, stat)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        for header, value in cache_headers.items():
+            response[header] = value
+
+        return response
+
+    def serve(self, request, path, full_path, stat):
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or 'application/octet-stream'
+
+        accel = settings.MEDIA_ACCEL_REDIRECT
+        if accel == 'nginx':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + path
+            return response
+        if accel == 'apache':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = full_path
+            return response
+
+        try:
+            byte_range = parse_range(
+                request.META.get('HTTP_RANGE'), stat.st_size
+            )
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % stat.st_size
+            return response
+
+        if byte_range is None:
+            response = FileResponse(
+                open(full_path, 'rb'), content_type=content_type
+            )
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                read_range(open(full_path, 'rb'), start, end),
+                status=206,
+                content_type=content_type,
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = 'bytes %d-%d/%d' % (
+                start, end, stat.st_size
+            )
+        response['Accept-Ranges'] = 'bytes'
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+        return response
@@ -0,0 +1,20 @@
+from core import health
+
+
+class HealthCheckMiddleware:
+    '''Answer health probes before the rest of the middleware stack runs,
+    so they skip sessions, CSRF, authentication and host validation'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.probes = {
+            '/healthz': health.healthz,
+            '/readyz': health.readyz,
+        }
+
+    def __call__(self, request):
+        probe = self.probes.get(request.path_info.rstrip('/'))
+        if probe is not None:
+            return probe(request)
+
+        return self.get_response(request)
@@ -0,0 +1,46 @@
+# Generated by Django 3.1.14 on 2026-10-19 14:39
+
+from django.db import migrations, models
+
+
+def fill_summaries(apps, schema_editor):
+    '''Fill the new columns, rebuild_recipe_summaries does the same later'''
+    Recipe = apps.get_model('core', 'Recipe')
+    recipes = list(Recipe.objects.prefetch_related('tags', 'ingredients'))
+    for recipe in recipes:
+        recipe.tag_names = sorted(tag.name for tag in recipe.tags.all())
+        recipe.ingredient_names = sorted(
+            ingredient.name for ingredient in recipe.ingredients.all()
+        )
+        recipe.ingredient_count = len(recipe.ingredient_names)
+    Recipe.objects.bulk_update(
+        recipes,
+        ['tag_names', 'ingredient_names', 'ingredient_count'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_unique_name_per_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_names',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_names',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
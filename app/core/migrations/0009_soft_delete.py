@@ -0,0 +1,57 @@
+# Generated by Django 3.1.14 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_summaries'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ingredient',
+            name='unique_ingredient_name_per_user',
+        ),
+        migrations.RemoveConstraint(
+            model_name='recipe',
+            name='unique_recipe_title_per_user',
+        ),
+        migrations.RemoveConstraint(
+            model_name='tag',
+            name='unique_tag_name_per_user',
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(condition=models.Q(deleted_at__isnull=True), fields=('user', 'name'), name='unique_ingredient_name_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(condition=models.Q(deleted_at__isnull=True), fields=('user', 'title'), name='unique_recipe_title_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(condition=models.Q(deleted_at__isnull=True), fields=('user', 'name'), name='unique_tag_name_per_user'),
+        ),
+    ]
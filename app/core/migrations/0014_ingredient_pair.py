@@ -0,0 +1,32 @@
+# Generated by Django 3.1.14 on 2026-10-19 14:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPair',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.ingredient')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.user')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ingredientpair',
+            index=models.Index(fields=['ingredient', '-count'], name='ingredient_pair_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientpair',
+            constraint=models.UniqueConstraint(fields=('ingredient', 'other'), name='unique_ingredient_pair'),
+        ),
+    ]
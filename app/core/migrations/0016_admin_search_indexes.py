@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+# The admin's ^field searches run UPPER("field"::text) LIKE UPPER('term%'),
+# which Postgres can only serve from an expression index with a pattern
+# operator class. Django 3.1 cannot declare expression indexes on models.
+INDEXES = (
+    ('core_user_email_search_idx', 'core_user', 'email'),
+    ('core_user_name_search_idx', 'core_user', 'name'),
+    ('core_tag_name_search_idx', 'core_tag', 'name'),
+    ('core_ingredient_name_search_idx', 'core_ingredient', 'name'),
+    ('core_recipe_title_search_idx', 'core_recipe', 'title'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, table, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" '
+            f'(UPPER("{column}"::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, table, column in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_is_public'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
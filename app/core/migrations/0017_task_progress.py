@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-19 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='progress',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='progress_total',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
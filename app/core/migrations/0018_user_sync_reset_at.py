@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-19 15:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_task_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='sync_reset_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.1.14 on 2026-10-19 15:27
+
+import core.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def copy_tokens(apps, schema_editor):
+    '''Keep the tokens issued so far, so nobody is logged out'''
+    Token = apps.get_model('authtoken', 'Token')
+    AuthToken = apps.get_model('core', 'AuthToken')
+    AuthToken.objects.bulk_create([
+        AuthToken(key=token.key, user_id=token.user_id, created=token.created)
+        for token in Token.objects.all()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_user_sync_reset_at'),
+        ('authtoken', '0002_auto_20160226_1747'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('jti', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AuthToken',
+            fields=[
+                ('key', models.CharField(default=core.models._token_key, max_length=40, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='auth_tokens', to='core.user')),
+            ],
+        ),
+        migrations.RunPython(copy_tokens, migrations.RunPython.noop),
+    ]
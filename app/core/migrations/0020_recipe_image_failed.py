@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-19 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_auth_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_failed',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
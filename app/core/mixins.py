@@ -0,0 +1,70 @@
+from rest_framework.permissions import SAFE_METHODS
+
+from core import routers
+
+
+class ReplicaReadMixin:
+    '''Serve safe requests from a read replica unless the user has just
+    written something, in which case the primary is used'''
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication runs in here, so it always reads from the primary
+        super().initial(request, *args, **kwargs)
+
+        if request.method not in SAFE_METHODS:
+            routers.pin_to_primary(request.user)
+        elif not routers.is_pinned_to_primary(request.user):
+            self._replica_token = routers.read_from_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            routers.read_from_replica.reset(token)
+            self._replica_token = None
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ThrottleWritesMixin:
+    '''Only apply the view's throttles to unsafe requests'''
+
+    def get_throttles(self):
+        if self.request.method in SAFE_METHODS:
+            return []
+
+        return super().get_throttles()
+
+
+class VersionETagMixin:
+    '''Expose the version of an object as its ETag and pass the version
+    from an If-Match header to the serializer for conditional updates'''
+
+    def get_expected_version(self):
+        '''Return the version in If-Match, None if there is none'''
+        if_match = self.request.META.get('HTTP_IF_MATCH', '').strip()
+        if not if_match or if_match == '*':
+            return None
+        if if_match.startswith('W/'):
+            if_match = if_match[2:]
+        try:
+            return int(if_match.strip('"'))
+        except ValueError:
+            # Cannot match any version
+            return 0
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method in ('PUT', 'PATCH'):
+            context['expected_version'] = self.get_expected_version()
+
+        return context
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        data = getattr(response, 'data', None)
+        if isinstance(data, dict) and 'version' in data:
+            response['ETag'] = f'"{data["version"]}"'
+
+        return response
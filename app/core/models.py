@@ -1,10 +1,13 @@
+import binascii
 import uuid
 import os
 
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Q
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager,\
                                          PermissionsMixin
 from django.conf import settings
+from django.utils import timezone
 
 
 def recipe_image_file_path(instance, filename):
@@ -44,44 +47,230 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
 
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # Sync cursors issued before this must start over, set when recipes
+    # are moved to another user and so never show up as deleted
+    sync_reset_at = models.DateTimeField(null=True, blank=True)
+
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    def soft_delete(self):
+        '''Deactivate the user and hide everything they own. The rows are
+        removed in batches later by the purge_deleted command'''
+        from core import surrogate
+
+        now = timezone.now()
+        with transaction.atomic():
+            self.is_active = False
+            self.deleted_at = now
+            self.save(update_fields=['is_active', 'deleted_at'])
+            public_ids = list(Recipe.objects.filter(
+                user=self, is_public=True
+            ).values_list('pk', flat=True))
+            # Queryset deletes send no signals. None of the user's recipes
+            # are left, so none of their ingredient pairs are either
+            IngredientPair.objects.filter(user=self).delete()
+            for model in (Recipe, Tag, Ingredient):
+                model.objects.filter(user=self).delete()
+
+        surrogate.recipes_changed(public_ids, was_public=public_ids)
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+
+    def delete(self):
+        '''Mark the rows as deleted in a single UPDATE'''
+        now = timezone.now()
+        changes = {'deleted_at': now}
+        if issubclass(self.model, VersionedModel):
+            changes.update(version=models.F('version') + 1, updated_at=now)
+
+        return self.update(**changes)
+
+    def hard_delete(self):
+        return super().delete()
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    '''Manager hiding soft deleted rows, unless include_deleted is set'''
+
+    def __init__(self, include_deleted=False):
+        super().__init__()
+        self.include_deleted = include_deleted
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.include_deleted:
+            return queryset
+
+        return queryset.filter(deleted_at__isnull=True)
+
+
+class SoftDeleteModel(models.Model):
+    '''Rows are only marked as deleted, see the purge_deleted command'''
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = SoftDeleteManager()
+    all_objects = SoftDeleteManager(include_deleted=True)
+
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at'])
+
+    def hard_delete(self, using=None, keep_parents=False):
+        return super().delete(using=using, keep_parents=keep_parents)
+
+
+class VersionedModel(models.Model):
+    '''Rows carry a version number bumped on every save, used for
+    optimistic concurrency control (If-Match / ETag), and the time of the
+    last change, used for incremental sync'''
+    version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
-class Tag(models.Model):
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'version', 'updated_at',
+                }
+
+        super().save(*args, **kwargs)
+
+
+class UpsertManager(SoftDeleteManager):
+    '''Manager with a race free, single statement get or create'''
+
+    def upsert(self, conflict_fields, **fields):
+        '''Insert a row unless one with the same conflict_fields exists.
+
+        Uses INSERT ... ON CONFLICT DO NOTHING RETURNING, so creating a
+        new row is one round trip and concurrent requests cannot both
+        insert. conflict_fields must match a unique constraint limited to
+        rows that are not soft deleted. No save signals are sent.
+        Returns (object, created).
+        '''
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        quote = connection.ops.quote_name
+        opts = self.model._meta
+        obj = self.model(**fields)
+
+        insert_fields = [
+            field for field in opts.local_concrete_fields
+            if not field.primary_key
+        ]
+        values = [
+            field.get_db_prep_save(field.pre_save(obj, True), connection)
+            for field in insert_fields
+        ]
+        columns = ', '.join(quote(field.column) for field in insert_fields)
+        placeholders = ', '.join(['%s'] * len(insert_fields))
+        conflict = ', '.join(
+            quote(opts.get_field(name).column) for name in conflict_fields
+        )
+        sql = (
+            f'INSERT INTO {quote(opts.db_table)} ({columns}) '
+            f'VALUES ({placeholders}) '
+            f'ON CONFLICT ({conflict}) WHERE {quote("deleted_at")} IS NULL '
+            f'DO NOTHING '
+            f'RETURNING {quote(opts.pk.column)}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, values)
+            row = cursor.fetchone()
+
+        if row is None:
+            lookup = {name: fields[name] for name in conflict_fields}
+            return self.using(db).get(**lookup), False
+
+        obj.pk = row[0]
+        obj._state.adding = False
+        obj._state.db = db
+
+        return obj, True
+
+
+class Tag(SoftDeleteModel, VersionedModel):
     '''Tag to be used for a recipe'''
-    name = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
     # This is the best practice for user foreign key
 
+    objects = UpsertManager()
+    all_objects = UpsertManager(include_deleted=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                condition=Q(deleted_at__isnull=True),
+                name='unique_tag_name_per_user',
+            ),
+        ]
+        indexes = [
+            # Keyset pagination of the changes feed
+            models.Index(
+                fields=['user', 'updated_at', 'id'], name='tag_changes_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(SoftDeleteModel, VersionedModel):
     '''Ingredient to be used for a recipe'''
-    name = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
     # This is the best practice for user foreign key
 
+    objects = UpsertManager()
+    all_objects = UpsertManager(include_deleted=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                condition=Q(deleted_at__isnull=True),
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
+        indexes = [
+            # Keyset pagination of the changes feed
+            models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='ingredient_changes_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(SoftDeleteModel, VersionedModel):
     '''Recipe object'''
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
-    title = models.CharField(max_length=255, blank=False, unique=True)
+    title = models.CharField(max_length=255, blank=False)
     time_minutes = models.IntegerField()
     price_of_ingredient = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
@@ -90,6 +279,191 @@ class Recipe(models.Model):
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
     # for detail info read
     # https://docs.djangoproject.com/en/3.0/ref/models/fields/#django.db.models.FileField.upload_to
+    # Denormalized from tags and ingredients by core.summaries, so recipe
+    # cards render without joins
+    tag_names = models.JSONField(default=list, blank=True, editable=False)
+    ingredient_names = models.JSONField(
+        default=list, blank=True, editable=False
+    )
+    ingredient_count = models.PositiveIntegerField(default=0, editable=False)
+    # Computed from the image by core.images, so clients can paint a
+    # blurred preview before the image loads
+    image_placeholder = models.TextField(blank=True, editable=False)
+    image_color = models.CharField(max_length=7, blank=True, editable=False)
+    # Set when the image could not be decoded, so it is not retried
+    image_failed = models.BooleanField(default=False, editable=False)
+    # Public recipes are readable by anyone through the public endpoint
+    is_public = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'title'],
+                condition=Q(deleted_at__isnull=True),
+                name='unique_recipe_title_per_user',
+            ),
+        ]
+        indexes = [
+            # Keyset pagination of the changes feed
+            models.Index(
+                fields=['user', 'updated_at', 'id'], name='recipe_changes_idx'
+            ),
+            # Listing public recipes only ever reads the live public rows
+            models.Index(
+                fields=['-id'],
+                condition=Q(is_public=True, deleted_at__isnull=True),
+                name='recipe_public_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class IngredientPairManager(models.Manager):
+
+    def add_counts(self, counts):
+        '''Add {(user_id, ingredient_id, other_id): n} to the pair counts in
+        a single INSERT ... ON CONFLICT DO UPDATE'''
+        if not counts:
+            return
+
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(counts))
+        sql = (
+            f'INSERT INTO {table} '
+            f'(user_id, ingredient_id, other_id, {quote("count")}) '
+            f'VALUES {placeholders} '
+            f'ON CONFLICT (ingredient_id, other_id) DO UPDATE '
+            f'SET {quote("count")} = {table}.{quote("count")} '
+            f'+ EXCLUDED.{quote("count")}'
+        )
+        values = [
+            value
+            for (user_id, ingredient_id, other_id), n in counts.items()
+            for value in (user_id, ingredient_id, other_id, n)
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, values)
+
+    def subtract_counts(self, counts):
+        '''Subtract {(user_id, ingredient_id, other_id): n} from the pair
+        counts, removing pairs that reach zero'''
+        by_amount = {}
+        for (user_id, ingredient_id, other_id), n in counts.items():
+            by_amount.setdefault(n, Q())
+            by_amount[n] |= Q(ingredient_id=ingredient_id, other_id=other_id)
+
+        for n, pairs in by_amount.items():
+            queryset = self.filter(pairs)
+            queryset.filter(count__lte=n).delete()
+            queryset.update(count=models.F('count') - n)
+
+
+class IngredientPair(models.Model):
+    '''How many of a user's live recipes use both ingredients. Stored in
+    both directions so the ingredients used with one are a single index
+    range scan. Kept up to date by core.signals, rebuilt with the
+    rebuild_ingredient_pairs command'''
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name='+'
+    )
+    other = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name='+'
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    objects = IngredientPairManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ingredient', 'other'], name='unique_ingredient_pair'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['ingredient', '-count'], name='ingredient_pair_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient_id} + {self.other_id}: {self.count}'
+
+
+class Task(models.Model):
+    '''Background job stored in the database, see core.taskqueue'''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Reported by long running tasks through taskqueue.report_progress
+    progress = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'], name='task_status_run_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+
+def _token_key():
+    return binascii.hexlify(os.urandom(20)).decode()
+
+
+class AuthToken(models.Model):
+    '''Database auth token. Every login gets its own, so devices can be
+    logged out one at a time'''
+    key = models.CharField(max_length=40, primary_key=True,
+                           default=_token_key)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='auth_tokens',
+    )
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.key[:8]}...'
+
+
+class RevokedToken(models.Model):
+    '''Id of a revoked signed token, kept until the token would have
+    expired anyway'''
+    jti = models.CharField(max_length=32, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
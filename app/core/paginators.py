@@ -0,0 +1,75 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.lookups import IsNull
+from django.utils.functional import cached_property
+
+
+def live_rows_only(query):
+    '''Return True if the only filter of the query is deleted_at IS NULL,
+    the default of the soft delete changelists'''
+    where = query.where
+    if where.negated or len(where.children) != 1:
+        return False
+    lookup = where.children[0]
+
+    return (
+        isinstance(lookup, IsNull)
+        and lookup.rhs is True
+        and getattr(lookup.lhs, 'target', None) is not None
+        and lookup.lhs.target.name == 'deleted_at'
+    )
+
+
+class EstimatedCountPaginator(Paginator):
+    '''Paginator that takes the row count of a Postgres table from the
+    planner statistics instead of running COUNT(*), which reads the whole
+    table. Unfiltered querysets use pg_class.reltuples, ones filtered to
+    the live rows of a soft delete model scale it by the null fraction of
+    deleted_at. Small tables, other filters and other databases get an
+    exact count.'''
+    estimate_threshold = 10000
+
+    def _statistics(self, connection, table):
+        '''Return (reltuples, null fraction of deleted_at) of the table.
+        The fraction is None if the column is missing or not analyzed'''
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                SELECT c.reltuples, (
+                    SELECT s.null_frac FROM pg_stats s
+                    JOIN pg_namespace n ON n.nspname = s.schemaname
+                    WHERE n.oid = c.relnamespace AND s.tablename = c.relname
+                    AND s.attname = 'deleted_at'
+                )
+                FROM pg_class c WHERE c.oid = %s::regclass
+                ''',
+                [connection.ops.quote_name(table)],
+            )
+            row = cursor.fetchone()
+
+        return row or (None, None)
+
+    def _estimate(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        live_only = live_rows_only(queryset.query)
+        if queryset.query.where and not live_only:
+            return None
+
+        reltuples, live_fraction = self._statistics(
+            connection, queryset.model._meta.db_table
+        )
+        if reltuples is None or (live_only and live_fraction is None):
+            return None
+
+        return int(reltuples * live_fraction if live_only else reltuples)
+
+    @cached_property
+    def count(self):
+        estimate = self._estimate()
+        if estimate is not None and estimate >= self.estimate_threshold:
+            return estimate
+
+        return super().count
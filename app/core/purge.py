@@ -0,0 +1,83 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from core import cooccurrence
+from core.models import Ingredient, Recipe, Tag
+
+
+def _batches(queryset, batch_size):
+    '''Yield lists of primary keys, re-querying after every batch since
+    the previous batch has been deleted by then'''
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[
+            :batch_size
+        ])
+        if not ids:
+            return
+        yield ids
+
+
+def purge_recipes(queryset, batch_size=500, pause=0):
+    '''Delete recipes, their tag/ingredient links and image files in
+    bounded batches, sleeping pause seconds between batches.
+    Returns the number of deleted recipes'''
+    deleted = 0
+    for ids in _batches(queryset, batch_size):
+        images = list(
+            Recipe.all_objects.filter(pk__in=ids).exclude(image='')
+            .exclude(image__isnull=True).values_list('image', flat=True)
+        )
+        live_ids = list(Recipe.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True
+        ))
+        with transaction.atomic():
+            # Soft deleted recipes were uncounted when they were deleted
+            cooccurrence.recipes_removed(live_ids)
+            Recipe.tags.through.objects.filter(recipe_id__in=ids).delete()
+            Recipe.ingredients.through.objects.filter(
+                recipe_id__in=ids
+            ).delete()
+            Recipe.all_objects.filter(pk__in=ids).hard_delete()
+        # Only remove files once the rows referencing them are gone
+        for name in images:
+            default_storage.delete(name)
+
+        deleted += len(ids)
+        time.sleep(pause)
+
+    return deleted
+
+
+def purge_recipe_attrs(queryset, batch_size=500, pause=0):
+    '''Delete tags or ingredients and their recipe links in bounded
+    batches. Returns the number of deleted rows'''
+    model = queryset.model
+    through = Recipe.tags.through if model is Tag else \
+        Recipe.ingredients.through
+    link = 'tag_id' if model is Tag else 'ingredient_id'
+
+    deleted = 0
+    for ids in _batches(queryset, batch_size):
+        with transaction.atomic():
+            through.objects.filter(**{f'{link}__in': ids}).delete()
+            model.all_objects.filter(pk__in=ids).hard_delete()
+
+        deleted += len(ids)
+        time.sleep(pause)
+
+    return deleted
+
+
+def purge_user(user, batch_size=500, pause=0):
+    '''Delete a user and everything they own in bounded batches'''
+    purge_recipes(
+        Recipe.all_objects.filter(user=user), batch_size, pause
+    )
+    for model in (Tag, Ingredient):
+        purge_recipe_attrs(
+            model.all_objects.filter(user=user), batch_size, pause
+        )
+    # Only the user row and its auth token are left to cascade
+    user.delete()
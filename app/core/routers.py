@@ -0,0 +1,45 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Set for the duration of a safe API request that may read from a replica
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def _pin_key(user):
+    return f'db-pin:{user.pk}'
+
+
+def pin_to_primary(user):
+    '''Send reads of this user to the primary for a short while'''
+    if user.is_authenticated:
+        cache.set(_pin_key(user), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    '''Return True if the user wrote something recently'''
+    return user.is_authenticated and bool(cache.get(_pin_key(user)))
+
+
+class PrimaryReplicaRouter:
+    '''Route reads of safe requests to replicas and everything else to
+    the primary database'''
+
+    def db_for_read(self, model, **hints):
+        if read_from_replica.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # Objects loaded from a replica must still be saved on the primary
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
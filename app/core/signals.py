@@ -0,0 +1,132 @@
+from django.db.models.signals import m2m_changed, post_delete, \
+                                     post_init, post_save, pre_delete
+
+from core import cooccurrence, tasks
+from core.models import Ingredient, Recipe, Tag
+from core.summaries import refresh_summaries
+
+
+def _recipe_ids_for(obj):
+    '''Return the ids of recipes using a tag or ingredient'''
+    return list(obj.recipe_set.values_list('pk', flat=True))
+
+
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    '''Refresh summaries when tags or ingredients are added or removed'''
+    if action == 'pre_clear' and reverse:
+        # The affected recipes cannot be looked up once the rows are gone
+        instance._summary_recipe_ids = _recipe_ids_for(instance)
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        refresh_summaries([instance.pk], instance=instance)
+    elif action == 'post_clear':
+        refresh_summaries(instance.__dict__.pop('_summary_recipe_ids', []))
+    else:
+        refresh_summaries(pk_set)
+
+
+def _summary_state(instance):
+    '''The fields of a tag or ingredient that recipe summaries depend on.
+    Read from __dict__ so deferred fields are not loaded'''
+    return instance.__dict__.get('name'), instance.__dict__.get('deleted_at')
+
+
+def recipe_attr_loaded(sender, instance, **kwargs):
+    instance._summary_state = _summary_state(instance)
+
+
+def recipe_attr_saved(sender, instance, created, raw=False, **kwargs):
+    '''Refresh summaries of recipes using a renamed or soft deleted tag or
+    ingredient. A popular tag can be on many recipes, so this runs in the
+    background'''
+    state = _summary_state(instance)
+    if created or raw or state == instance._summary_state:
+        return
+
+    instance._summary_state = state
+    tasks.refresh_recipe_summaries.delay(_recipe_ids_for(instance))
+
+
+def recipe_attr_pre_delete(sender, instance, **kwargs):
+    instance._summary_recipe_ids = _recipe_ids_for(instance)
+
+
+def recipe_attr_deleted(sender, instance, **kwargs):
+    '''Refresh summaries of recipes that used a deleted tag or ingredient'''
+    refresh_summaries(instance.__dict__.pop('_summary_recipe_ids', []))
+
+
+def _linked(instance, reverse, pk_set):
+    '''Return the pks in pk_set that are linked to instance'''
+    links = Recipe.ingredients.through.objects
+    if reverse:
+        return set(links.filter(
+            ingredient_id=instance.pk, recipe_id__in=pk_set
+        ).values_list('recipe_id', flat=True))
+
+    return set(links.filter(
+        recipe_id=instance.pk, ingredient_id__in=pk_set
+    ).values_list('ingredient_id', flat=True))
+
+
+def ingredient_pairs_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    '''Keep the ingredient co-occurrence counts up to date'''
+    if action == 'pre_remove':
+        # remove() reports every pk passed, linked or not
+        instance._pair_pks = _linked(instance, reverse, pk_set)
+        return
+    if action == 'pre_clear':
+        linked = Recipe.ingredients.through.objects.filter(
+            **{'ingredient_id' if reverse else 'recipe_id': instance.pk}
+        ).values_list('recipe_id' if reverse else 'ingredient_id', flat=True)
+        instance._pair_pks = set(linked)
+        return
+    if action == 'post_add':
+        pks, update = pk_set, cooccurrence.ingredients_added
+    elif action in ('post_remove', 'post_clear'):
+        pks = instance.__dict__.pop('_pair_pks', set())
+        update = cooccurrence.ingredients_removed
+    else:
+        return
+
+    if not pks:
+        return
+    if reverse:
+        update(pks, [instance.pk])
+    else:
+        update([instance.pk], pks)
+
+
+def recipe_saved(sender, instance, created, update_fields=None, raw=False,
+                 **kwargs):
+    '''Uncount the ingredient pairs of a soft deleted recipe'''
+    if (not raw and update_fields and 'deleted_at' in update_fields
+            and instance.deleted_at is not None):
+        cooccurrence.recipe_removed(instance.pk)
+
+
+def recipe_pre_delete(sender, instance, **kwargs):
+    '''Uncount the ingredient pairs of a live recipe being hard deleted'''
+    if instance.deleted_at is None:
+        cooccurrence.recipe_removed(instance.pk)
+
+
+for through in (Recipe.tags.through, Recipe.ingredients.through):
+    m2m_changed.connect(recipe_relations_changed, sender=through)
+
+for model in (Tag, Ingredient):
+    post_init.connect(recipe_attr_loaded, sender=model)
+    post_save.connect(recipe_attr_saved, sender=model)
+    pre_delete.connect(recipe_attr_pre_delete, sender=model)
+    post_delete.connect(recipe_attr_deleted, sender=model)
+
+m2m_changed.connect(
+    ingredient_pairs_changed, sender=Recipe.ingredients.through
+)
+post_save.connect(recipe_saved, sender=Recipe)
+pre_delete.connect(recipe_pre_delete, sender=Recipe)
@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+
+from core.models import Recipe
+
+
+METRICS = ('jaccard', 'cosine')
+
+_lock = threading.Lock()
+_indexes = OrderedDict()  # user_id -> SimilarityIndex, least recent first
+
+
+def _feature(kind, pk):
+    '''Tags and ingredients share one column space: even and odd ids'''
+    return pk * 2 + (kind == 'ingredient')
+
+
+class SimilarityIndex:
+    '''Recipes of one user as rows of a binary sparse matrix over their
+    tags and ingredients'''
+
+    def __init__(self, recipe_ids, matrix, columns, stamp, built_at=None):
+        self.recipe_ids = recipe_ids
+        self.matrix = matrix
+        self.columns = columns  # feature -> column
+        self.stamp = stamp
+        self.built_at = built_at or time.monotonic()
+        self.positions = {pk: n for n, pk in enumerate(recipe_ids.tolist())}
+        self.sizes = np.diff(matrix.indptr).astype(np.float32)
+
+    @staticmethod
+    def _rows_matrix(rows, columns):
+        '''Return (recipe_ids, csr matrix) for {recipe_id: features},
+        adding new features to columns'''
+        recipe_ids = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        indices = []
+        indptr = [0]
+        for features in rows.values():
+            indices.extend(
+                columns.setdefault(feature, len(columns))
+                for feature in features
+            )
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr),
+            shape=(len(rows), max(len(columns), 1)),
+        )
+
+        return recipe_ids, matrix
+
+    @classmethod
+    def build(cls, rows, stamp):
+        columns = {}
+        recipe_ids, matrix = cls._rows_matrix(rows, columns)
+
+        return cls(recipe_ids, matrix, columns, stamp)
+
+    def updated(self, changed, stamp):
+        '''Return a copy with the rows of changed recipes replaced, None
+        removes a recipe. Unchanged rows are sliced out of the current
+        matrix rather than rebuilt, and copying leaves this index safe to
+        read from other threads'''
+        columns = dict(self.columns)
+        keep = ~np.isin(self.recipe_ids, list(changed))
+        new_ids, new_matrix = self._rows_matrix(
+            {pk: f for pk, f in changed.items() if f is not None}, columns
+        )
+        kept = self.matrix[keep]
+        width = max(len(columns), 1)
+        kept.resize((kept.shape[0], width))
+        new_matrix.resize((new_matrix.shape[0], width))
+
+        return SimilarityIndex(
+            np.concatenate([self.recipe_ids[keep], new_ids]),
+            sparse.vstack([kept, new_matrix], format='csr'),
+            columns,
+            stamp,
+            built_at=self.built_at,
+        )
+
+    def similar(self, recipe_id, metric='jaccard', limit=10):
+        '''Return [(recipe_id, score)] of the most similar other recipes'''
+        position = self.positions.get(recipe_id)
+        if position is None or not self.sizes[position]:
+            return []
+
+        row = self.matrix[position]
+        shared = (self.matrix @ row.T).toarray().ravel()
+        size = self.sizes[position]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if metric == 'cosine':
+                scores = shared / np.sqrt(size * self.sizes)
+            else:
+                scores = shared / (size + self.sizes - shared)
+        scores = np.nan_to_num(scores)
+        scores[position] = 0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit)[:limit]
+            candidates = candidates[top]
+        # Highest score first, ties broken by recipe id
+        order = np.lexsort((self.recipe_ids[candidates], -scores[candidates]))
+
+        return [
+            (int(self.recipe_ids[n]), float(scores[n]))
+            for n in candidates[order]
+        ]
+
+
+def _load_rows(user, recipe_ids=None):
+    '''Return {recipe_id: frozenset of features} for live recipes'''
+    recipes = Recipe.objects.filter(user=user)
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    rows = {pk: set() for pk in recipes.values_list('pk', flat=True)}
+
+    for kind, through in (('tag', Recipe.tags.through),
+                          ('ingredient', Recipe.ingredients.through)):
+        links = through.objects.filter(
+            recipe_id__in=recipes.values('pk'),
+            **{f'{kind}__deleted_at__isnull': True}
+        ).values_list('recipe_id', f'{kind}_id')
+        for recipe_id, pk in links:
+            rows[recipe_id].add(_feature(kind, pk))
+
+    return {pk: frozenset(features) for pk, features in rows.items()}
+
+
+def get_index(user):
+    '''Return the similarity index of a user's recipes.
+
+    Indexes are kept in process for the SIMILARITY_CACHE_USERS most
+    recently used users. Every recipe write, including tag and ingredient
+    changes, moves the recipe's updated_at, so each call compares the
+    latest updated_at with the index and reloads only the recipes changed
+    since, going back SYNC_SETTLE_SECONDS to catch transactions that
+    committed late. Indexes older than SIMILARITY_INDEX_TTL, or holding
+    the wrong number of recipes, are rebuilt.
+    '''
+    stamp = Recipe.all_objects.filter(user=user).aggregate(
+        latest=Max('updated_at'),
+        live=Count('id', filter=Q(deleted_at__isnull=True)),
+    )
+    stamp, live = stamp['latest'], stamp['live']
+
+    with _lock:
+        index = _indexes.get(user.pk)
+        if index is not None:
+            _indexes.move_to_end(user.pk)
+    expired = index is None or index.stamp is None or (
+        time.monotonic() - index.built_at > settings.SIMILARITY_INDEX_TTL
+    )
+
+    if not expired and stamp == index.stamp:
+        if live == len(index.recipe_ids):
+            return index
+    elif not expired:
+        since = index.stamp - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+        changed_ids = list(Recipe.all_objects.filter(
+            user=user, updated_at__gt=since
+        ).values_list('pk', flat=True))
+        rows = _load_rows(user, changed_ids)
+        index = index.updated(
+            {pk: rows.get(pk) for pk in changed_ids}, stamp
+        )
+
+    # Recipes moved to another user leave no trace in this user's
+    # updated_at, only in the number of recipes
+    if expired or live != len(index.recipe_ids):
+        index = SimilarityIndex.build(_load_rows(user), stamp)
+
+    with _lock:
+        _indexes[user.pk] = index
+        _indexes.move_to_end(user.pk)
+        while len(_indexes) > settings.SIMILARITY_CACHE_USERS:
+            _indexes.popitem(last=False)
+
+    return index
+
+
+def clear_indexes():
+    with _lock:
+        _indexes.clear()
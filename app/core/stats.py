@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models import Aggregate, Avg, Count, DecimalField, Max, Sum
+
+from core.models import Recipe
+
+
+TOP_INGREDIENTS = 10
+
+
+class Median(Aggregate):
+    '''Postgres ordered set aggregate for the median of a column'''
+    function = 'PERCENTILE_CONT'
+    name = 'Median'
+    template = '%(function)s(0.5) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+
+def _median(queryset, field, count):
+    '''Median of field without PERCENTILE_CONT: fetch the middle one or two
+    values in a single ordered query'''
+    if not count:
+        return None
+
+    values = list(
+        queryset.order_by(field).values_list(field, flat=True)
+        [(count - 1) // 2:count // 2 + 1]
+    )
+
+    return sum(values) / len(values)
+
+
+def compute_stats(user):
+    '''Return recipe statistics for a user, each computed by a single
+    grouped query in the database'''
+    recipes = Recipe.objects.filter(user=user)
+    aggregates = {
+        'recipe_count': Count('id'),
+        'avg_time_minutes': Avg('time_minutes'),
+        'total_price': Sum('price_of_ingredient'),
+        'avg_price': Avg('price_of_ingredient'),
+    }
+    db = router.db_for_read(Recipe)
+    if connections[db].vendor == 'postgresql':
+        aggregates['median_price'] = Median(
+            'price_of_ingredient', output_field=DecimalField()
+        )
+    stats = recipes.aggregate(**aggregates)
+    if 'median_price' not in stats:
+        stats['median_price'] = _median(
+            recipes, 'price_of_ingredient', stats['recipe_count']
+        )
+
+    stats['tags'] = list(
+        Recipe.tags.through.objects.filter(
+            recipe__user=user,
+            recipe__deleted_at__isnull=True,
+            tag__deleted_at__isnull=True,
+        ).values(
+            'tag_id', 'tag__name'
+        ).annotate(
+            recipe_count=Count('recipe_id')
+        ).order_by('-recipe_count', 'tag__name')
+    )
+    stats['top_ingredients'] = list(
+        Recipe.ingredients.through.objects.filter(
+            recipe__user=user,
+            recipe__deleted_at__isnull=True,
+            ingredient__deleted_at__isnull=True,
+        ).values(
+            'ingredient_id', 'ingredient__name'
+        ).annotate(
+            recipe_count=Count('recipe_id')
+        ).order_by('-recipe_count', 'ingredient__name')[:TOP_INGREDIENTS]
+    )
+
+    return stats
+
+
+def get_stats(user):
+    '''Return compute_stats(user), cached until the user's recipes change.
+
+    Every write to a recipe, including soft deletes and summary refreshes,
+    moves its updated_at, so the latest updated_at is part of the cache
+    key and a write makes the cached entry unreachable. Recipes moved to
+    another user leave no trace in updated_at, so the row count is part
+    of it too. Looking both up is an index only scan on
+    (user, updated_at, id).
+    '''
+    stamp = Recipe.all_objects.filter(user=user).aggregate(
+        latest=Max('updated_at'), count=Count('id')
+    )
+    latest = stamp['latest']
+    stamp = f'{latest.isoformat()}:{stamp["count"]}' if latest else 'none'
+    key = f'recipe-stats:{user.pk}:{stamp}'
+
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(user)
+        cache.set(key, stats, settings.RECIPE_STATS_CACHE_SECONDS)
+
+    return stats
@@ -0,0 +1,64 @@
+import posixpath
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+
+
+UPLOAD_SALT = 'core.storage.upload'
+IMAGE_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+def supports_direct_upload(storage=default_storage):
+    '''Whether clients can upload straight to the storage backend'''
+    return hasattr(storage, 'bucket')
+
+
+def create_upload(name, content_type, owner, storage=default_storage):
+    '''Return a pre-signed POST that lets a client upload the object name
+    to the bucket directly, and a token to hand back once it is done.
+    owner identifies what the upload is for and must match on completion.
+    '''
+    client = storage.bucket.meta.client
+    name = storage.generate_filename(name)
+    # The bucket key of name, as the storage would write it
+    key = posixpath.join(storage.location, name) if storage.location \
+        else name
+    post = client.generate_presigned_post(
+        storage.bucket_name,
+        key,
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, settings.DIRECT_UPLOAD_MAX_SIZE],
+        ],
+        ExpiresIn=settings.DIRECT_UPLOAD_EXPIRES,
+    )
+    token = signing.dumps({'name': name, 'owner': owner}, salt=UPLOAD_SALT)
+
+    return {'url': post['url'], 'fields': post['fields'], 'token': token}
+
+
+def complete_upload(token, owner, storage=default_storage):
+    '''Return the object name from a token made by create_upload, once the
+    client has uploaded the object'''
+    try:
+        upload = signing.loads(
+            token,
+            salt=UPLOAD_SALT,
+            max_age=settings.DIRECT_UPLOAD_EXPIRES,
+        )
+        name = upload['name']
+    except (signing.BadSignature, KeyError, TypeError):
+        raise InvalidUpload('Invalid or expired upload token')
+
+    if upload.get('owner') != owner:
+        raise InvalidUpload('The upload token is for another object')
+    if not storage.exists(name):
+        raise InvalidUpload('The object has not been uploaded')
+
+    return name
@@ -0,0 +1,73 @@
+from django.utils import timezone
+
+from core import surrogate
+from core.models import Recipe
+
+
+SUMMARY_FIELDS = ('tag_names', 'ingredient_names', 'ingredient_count')
+
+
+def compute_summaries(recipe_ids):
+    '''Return {recipe_id: {field: value}} for the summary columns, using
+    one query per through table'''
+    summaries = {
+        recipe_id: {'tag_names': [], 'ingredient_names': []}
+        for recipe_id in recipe_ids
+    }
+    tags = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids,
+        tag__deleted_at__isnull=True,
+    ).values_list('recipe_id', 'tag__name')
+    for recipe_id, name in tags:
+        summaries[recipe_id]['tag_names'].append(name)
+
+    ingredients = Recipe.ingredients.through.objects.filter(
+        recipe_id__in=recipe_ids,
+        ingredient__deleted_at__isnull=True,
+    ).values_list('recipe_id', 'ingredient__name')
+    for recipe_id, name in ingredients:
+        summaries[recipe_id]['ingredient_names'].append(name)
+
+    for summary in summaries.values():
+        summary['tag_names'].sort()
+        summary['ingredient_names'].sort()
+        summary['ingredient_count'] = len(summary['ingredient_names'])
+
+    return summaries
+
+
+def refresh_summaries(recipe_ids, instance=None):
+    '''Recompute and store the summary columns of the given recipes.
+    instance, if given, is updated in memory as well'''
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+
+    summaries = compute_summaries(recipe_ids)
+    now = timezone.now()
+    recipes = [
+        Recipe(pk=recipe_id, updated_at=now, **summary)
+        for recipe_id, summary in summaries.items()
+    ]
+    # Touch updated_at so the change shows up in the sync feed
+    Recipe.objects.bulk_update(recipes, (*SUMMARY_FIELDS, 'updated_at'))
+    surrogate.recipes_changed(recipe_ids)
+
+    if instance is not None and instance.pk in summaries:
+        for field, value in summaries[instance.pk].items():
+            setattr(instance, field, value)
+        instance.updated_at = now
+
+
+def find_stale_summaries(recipes):
+    '''Return the ids of recipes whose stored summary is out of date'''
+    recipes = list(recipes)
+    summaries = compute_summaries([recipe.pk for recipe in recipes])
+
+    return [
+        recipe.pk for recipe in recipes
+        if any(
+            getattr(recipe, field) != value
+            for field, value in summaries[recipe.pk].items()
+        )
+    ]
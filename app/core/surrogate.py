@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from core.hotcache import HotCache
+
+
+PUBLIC_RECIPES_KEY = 'recipes'
+
+public_recipes = HotCache(
+    settings.PUBLIC_HOT_CACHE_SIZE, settings.PUBLIC_HOT_CACHE_SECONDS
+)
+
+
+def recipe_key(recipe_id):
+    return f'recipe-{recipe_id}'
+
+
+def purge_keys(keys):
+    '''Ask the shared cache (CDN) to drop responses tagged with the keys,
+    using the PUBLIC_CACHE_PURGE callable if one is configured'''
+    if settings.PUBLIC_CACHE_PURGE:
+        import_string(settings.PUBLIC_CACHE_PURGE)(list(keys))
+
+
+def recipes_changed(recipe_ids, was_public=None):
+    '''Drop cached public copies of the recipes. Called after writes.
+
+    Only recipes that are public, or were before the write (was_public,
+    None when the write did not change visibility), can be in the shared
+    cache, so only they are purged. List pages are tagged with the keys
+    of the recipes on them as well, so the list key is only purged when a
+    recipe joined or left the public recipes.
+    '''
+    from core.models import Recipe
+
+    recipe_ids = set(recipe_ids)
+    for recipe_id in recipe_ids:
+        public_recipes.delete(recipe_id)
+    if not recipe_ids or not settings.PUBLIC_CACHE_PURGE:
+        return
+
+    public = set(Recipe.objects.filter(
+        pk__in=recipe_ids, is_public=True
+    ).values_list('pk', flat=True))
+    was_public = public if was_public is None else set(was_public)
+    keys = [recipe_key(pk) for pk in sorted(public | was_public)]
+    if public != was_public:
+        keys.insert(0, PUBLIC_RECIPES_KEY)
+    if keys:
+        from core import tasks
+
+        tasks.purge_surrogate_keys.delay(keys)
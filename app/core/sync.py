@@ -0,0 +1,67 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(issued_at, positions):
+    '''Return an opaque cursor for {key: (updated_at, id)} positions'''
+    payload = {
+        'issued_at': issued_at.isoformat(),
+        'positions': {
+            key: [updated_at.isoformat(), pk]
+            for key, (updated_at, pk) in positions.items()
+        },
+    }
+    data = json.dumps(payload, separators=(',', ':')).encode()
+
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    '''Return (issued_at, positions) from a cursor made by encode_cursor'''
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(data)
+        issued_at = parse_datetime(payload['issued_at'])
+        positions = {
+            key: (parse_datetime(updated_at), int(pk))
+            for key, (updated_at, pk) in payload['positions'].items()
+        }
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursor('Invalid sync cursor')
+
+    if issued_at is None or None in (p[0] for p in positions.values()):
+        raise InvalidCursor('Invalid sync cursor')
+
+    return issued_at, positions
+
+
+def changes_since(queryset, position, until, limit):
+    '''Return up to limit rows of queryset changed after position and no
+    later than until, in (updated_at, id) order, plus whether more remain.
+
+    queryset should include soft deleted rows so deletions are reported.
+    '''
+    queryset = queryset.filter(updated_at__lte=until)
+    if position is not None:
+        updated_at, pk = position
+        queryset = queryset.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk)
+        )
+    rows = list(queryset.order_by('updated_at', 'pk')[:limit + 1])
+
+    return rows[:limit], len(rows) > limit
+
+
+def settled_until(settle_seconds):
+    '''Latest updated_at that is safe to hand out in a sync page'''
+    return timezone.now() - datetime.timedelta(seconds=settle_seconds)
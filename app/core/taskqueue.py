@@ -0,0 +1,160 @@
+import logging
+import traceback
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import Task
+
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+# Id of the task being run by run_task, for report_progress
+current_task = ContextVar('current_task', default=None)
+
+
+class TaskFunction:
+    '''A registered task. Call it to run inline, or use delay() to run it
+    on a worker'''
+
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        '''Queue the task. Arguments must be JSON serializable. In eager
+        mode (TASKS_EAGER) it runs right away instead'''
+        if settings.TASKS_EAGER:
+            self.func(*args, **kwargs)
+            return None
+
+        # Queued in the current transaction, so it is dropped on rollback
+        return Task.objects.create(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=self.max_attempts,
+        )
+
+
+def task(func=None, *, max_attempts=5):
+    '''Decorator registering a function as a background task'''
+    def register(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        registry[name] = TaskFunction(func, name, max_attempts)
+        return registry[name]
+
+    if func is not None:
+        return register(func)
+
+    return register
+
+
+def claim_tasks(limit=1):
+    '''Lock and mark up to limit due tasks as running.
+
+    FOR UPDATE SKIP LOCKED lets many workers poll the same table without
+    blocking on, or double claiming, each other's rows. Tasks left running
+    by a crashed worker are picked up again after TASKS_RUNNING_TIMEOUT,
+    unless they used up their attempts, so a task that keeps crashing
+    its worker ends up failed rather than being retried forever.
+    '''
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.TASKS_RUNNING_TIMEOUT)
+    with transaction.atomic():
+        Task.objects.filter(
+            status=Task.RUNNING,
+            updated_at__lt=stale,
+            attempts__gte=F('max_attempts'),
+        ).update(
+            status=Task.FAILED,
+            last_error='Worker stopped while running the last attempt',
+            updated_at=now,
+        )
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True).filter(
+                Q(status=Task.QUEUED, run_at__lte=now) |
+                Q(status=Task.RUNNING, updated_at__lt=stale)
+            ).order_by('run_at')[:limit]
+        )
+        Task.objects.filter(pk__in=[t.pk for t in tasks]).update(
+            status=Task.RUNNING,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+
+    for claimed in tasks:
+        claimed.status = Task.RUNNING
+        claimed.attempts += 1
+
+    return tasks
+
+
+def retry_delay(attempts):
+    '''Exponential backoff between attempts, capped'''
+    return min(
+        settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.TASKS_MAX_RETRY_DELAY,
+    )
+
+
+def run_task(claimed):
+    '''Run a claimed task and record the outcome'''
+    token = current_task.set(claimed.pk)
+    try:
+        func = registry[claimed.name]
+        func(*claimed.args, **claimed.kwargs)
+    except Exception:
+        logger.exception('Task %s (%s) failed', claimed.pk, claimed.name)
+        claimed.last_error = traceback.format_exc()
+        if claimed.attempts >= claimed.max_attempts:
+            claimed.status = Task.FAILED
+        else:
+            claimed.status = Task.QUEUED
+            claimed.run_at = timezone.now() + timedelta(
+                seconds=retry_delay(claimed.attempts)
+            )
+    else:
+        claimed.status = Task.DONE
+    finally:
+        current_task.reset(token)
+
+    claimed.save(update_fields=[
+        'status', 'run_at', 'last_error', 'updated_at',
+    ])
+
+
+def report_progress(done, total=None):
+    '''Record how far the running task got, shown in the admin. Does
+    nothing outside of a worker, e.g. when a task runs eagerly'''
+    task_id = current_task.get()
+    if task_id is None:
+        return
+
+    Task.objects.filter(pk=task_id).update(
+        progress=done, progress_total=total, updated_at=timezone.now()
+    )
+
+
+def run_pending(limit=None):
+    '''Run due tasks one at a time until none are left or limit tasks
+    have run. Returns the number of tasks run'''
+    count = 0
+    while limit is None or count < limit:
+        tasks = claim_tasks()
+        if not tasks:
+            break
+        run_task(tasks[0])
+        count += 1
+
+    return count
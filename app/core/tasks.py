@@ -0,0 +1,64 @@
+import logging
+
+from PIL import Image
+
+from django.utils import timezone
+
+from core import bulk, surrogate
+from core.images import compute_placeholder
+from core.models import Recipe
+from core.summaries import refresh_summaries
+from core.taskqueue import report_progress, task
+
+
+logger = logging.getLogger(__name__)
+
+
+@task
+def refresh_recipe_summaries(recipe_ids):
+    '''Recompute the summary columns of the given recipes'''
+    refresh_summaries(recipe_ids)
+
+
+@task
+def process_recipe_image(recipe_id):
+    '''Compute the placeholder and dominant colour of a recipe image'''
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+
+    try:
+        with recipe.image.open('rb') as fp:
+            placeholder, color = compute_placeholder(fp)
+    except (OSError, Image.DecompressionBombError):
+        # Direct uploads skip validation, retrying will not help
+        logger.warning('Recipe %s image cannot be decoded', recipe_id,
+                       exc_info=True)
+        Recipe.objects.filter(
+            pk=recipe_id, image=recipe.image.name
+        ).update(image_failed=True, updated_at=timezone.now())
+        surrogate.recipes_changed([recipe_id])
+        return
+
+    # Skip the update if another image was uploaded in the meantime
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(
+        image_placeholder=placeholder,
+        image_color=color,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        surrogate.recipes_changed([recipe_id])
+
+
+@task
+def purge_surrogate_keys(keys):
+    '''Purge responses tagged with the surrogate keys from the CDN'''
+    surrogate.purge_keys(keys)
+
+
+@task
+def bulk_recipe_action(action, recipe_ids, **params):
+    '''Run one of the core.bulk actions, reporting progress per batch'''
+    bulk.ACTIONS[action](recipe_ids, progress=report_progress, **params)
@@ -1,7 +1,14 @@
-from django.test import TestCase, Client
+from unittest.mock import patch
+
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 
+from core import taskqueue
+from core.models import Ingredient, IngredientPair, Recipe, Tag, Task
+from core.paginators import EstimatedCountPaginator
+
 
 class AdminSiteTests(TestCase):
 
@@ -39,3 +46,298 @@ class AdminSiteTests(TestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, 200)
+
+    def test_user_search(self):
+        '''Test that users can be searched by email prefix'''
+        url = reverse('admin:core_user_changelist')
+        response = self.client.get(url, {'q': 'test@'})
+
+        self.assertContains(response, self.user.email)
+        self.assertContains(response, '1 result')
+
+    def test_recipe_attr_changelists(self):
+        '''Test tag and ingredient changelists hide deleted rows by default'''
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Gone').delete()
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        response = self.client.get(reverse('admin:core_tag_changelist'))
+        self.assertContains(response, 'Vegan')
+        self.assertNotContains(response, 'Gone')
+
+        response = self.client.get(
+            reverse('admin:core_tag_changelist'), {'deleted': 'yes'}
+        )
+        self.assertNotContains(response, 'Vegan')
+        self.assertContains(response, 'Gone')
+
+        response = self.client.get(
+            reverse('admin:core_tag_changelist'), {'deleted': 'all'}
+        )
+        self.assertContains(response, 'Vegan')
+        self.assertContains(response, 'Gone')
+
+        response = self.client.get(
+            reverse('admin:core_ingredient_changelist'), {'q': 'sa'}
+        )
+        self.assertContains(response, 'Salt')
+
+    def test_recipe_changelist_and_change_page(self):
+        '''Test the recipe admin pages render'''
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price_of_ingredient=1.00
+        )
+
+        response = self.client.get(reverse('admin:core_recipe_changelist'))
+        self.assertContains(response, 'Soup')
+
+        response = self.client.get(
+            reverse('admin:core_recipe_change', args=[recipe.id])
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_tag_autocomplete_skips_deleted(self):
+        '''Test deleted tags are not offered for recipes'''
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Vegetarian').delete()
+
+        response = self.client.get(
+            reverse('admin:core_tag_autocomplete'), {'term': 'veg'}
+        )
+
+        names = [result['text'] for result in response.json()['results']]
+        self.assertEqual(names, ['Vegan'])
+
+
+class EstimatedCountPaginatorTests(TestCase):
+
+    def test_exact_count_without_estimate(self):
+        '''Test that small or non-Postgres tables are counted'''
+        Tag.objects.create(
+            user=get_user_model().objects.create_user('a@b.com', 'pass'),
+            name='Vegan'
+        )
+        paginator = EstimatedCountPaginator(Tag.all_objects.all(), 10)
+
+        self.assertEqual(paginator.count, 1)
+
+    def test_large_estimate_is_used(self):
+        '''Test that a large table estimate replaces COUNT(*)'''
+        paginator = EstimatedCountPaginator(Tag.all_objects.all(), 10)
+
+        with patch.object(paginator, '_estimate', return_value=2000000), \
+                self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 2000000)
+
+    def _postgres(self, reltuples, live_fraction):
+        '''Pretend to run on Postgres with the given table statistics'''
+        vendor = patch.object(connection, 'vendor', 'postgresql')
+        statistics = patch.object(
+            EstimatedCountPaginator, '_statistics',
+            return_value=(reltuples, live_fraction),
+        )
+        vendor.start()
+        statistics.start()
+        self.addCleanup(vendor.stop)
+        self.addCleanup(statistics.stop)
+
+    def test_live_rows_estimate(self):
+        '''Test the live rows are estimated from the deleted_at statistics
+        and other filters are counted'''
+        self._postgres(2000000, 0.9)
+        live = EstimatedCountPaginator(
+            Tag.all_objects.filter(deleted_at__isnull=True).order_by('pk'), 10
+        )
+        deleted = EstimatedCountPaginator(
+            Tag.all_objects.filter(deleted_at__isnull=False).order_by('pk'), 10
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(live.count, 1800000)
+        self.assertEqual(deleted.count, 0)
+
+    def test_default_changelist_uses_estimate(self):
+        '''Test the default changelist, showing the live rows, counts them
+        from the table statistics'''
+        self._postgres(2000000, 0.5)
+        client = Client()
+        client.force_login(get_user_model().objects.create_superuser(
+            'admin@gmail.com', 'test123'
+        ))
+
+        response = client.get(reverse('admin:core_recipe_changelist'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 1000000)
+
+
+class RecipeBulkActionTests(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(get_user_model().objects.create_superuser(
+            email='admin@gmail.com',
+            password='test123'
+        ))
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'password123'
+        )
+        self.other = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'password123'
+        )
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.pepper = Ingredient.objects.create(user=self.user, name='Pepper')
+
+    def sample_recipe(self, title, user=None):
+        recipe = Recipe.objects.create(
+            user=user or self.user, title=title, time_minutes=5,
+            price_of_ingredient=1.00
+        )
+        if user is None:
+            recipe.ingredients.add(self.salt, self.pepper)
+
+        return recipe
+
+    def run_action(self, action, recipes, **data):
+        return self.client.post(reverse('admin:core_recipe_changelist'), {
+            'action': action,
+            '_selected_action': [recipe.pk for recipe in recipes],
+            **data,
+        }, follow=True)
+
+    def test_default_delete_action_removed(self):
+        '''Test the recipe changelist offers the batched delete only'''
+        self.sample_recipe('Soup')
+
+        response = self.client.get(reverse('admin:core_recipe_changelist'))
+
+        self.assertNotContains(response, 'value="delete_selected"')
+        self.assertContains(response, 'value="bulk_delete"')
+
+    def test_bulk_delete(self):
+        '''Test recipes are soft deleted and their pairs uncounted'''
+        soup = self.sample_recipe('Soup')
+        stew = self.sample_recipe('Stew')
+        keep = self.sample_recipe('Salad', self.other)
+
+        with self.settings(ADMIN_BULK_BATCH_SIZE=1):
+            response = self.run_action('bulk_delete', [soup, stew])
+
+        self.assertContains(response, 'Deleted 2 recipes.')
+        self.assertEqual(list(Recipe.objects.all()), [keep])
+        self.assertFalse(IngredientPair.objects.exists())
+
+    def test_bulk_add_and_remove_tag(self):
+        '''Test recipes are tagged with their owner's tag of that name'''
+        soup = self.sample_recipe('Soup')
+        salad = self.sample_recipe('Salad', self.other)
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        soup.tags.add(vegan)
+
+        response = self.run_action(
+            'bulk_add_tag', [soup, salad], tag_name='Vegan'
+        )
+
+        self.assertContains(response, 'Tagged 1 recipes.')
+        self.assertEqual(list(soup.tags.all()), [vegan])
+        other_tag = Tag.objects.get(user=self.other)
+        self.assertEqual(list(salad.tags.all()), [other_tag])
+        salad.refresh_from_db()
+        self.assertEqual(salad.tag_names, ['Vegan'])
+        self.assertEqual(salad.version, 2)
+        soup.refresh_from_db()
+        self.assertEqual(soup.version, 1)
+
+        response = self.run_action(
+            'bulk_remove_tag', [soup, salad], tag_name='Vegan'
+        )
+
+        self.assertContains(response, 'Untagged 2 recipes.')
+        self.assertFalse(Recipe.tags.through.objects.exists())
+        salad.refresh_from_db()
+        self.assertEqual(salad.tag_names, [])
+        self.assertEqual(salad.version, 3)
+
+    def test_bulk_tag_requires_name(self):
+        '''Test tagging without a tag name changes nothing'''
+        soup = self.sample_recipe('Soup')
+
+        response = self.run_action('bulk_add_tag', [soup])
+
+        self.assertContains(response, 'Enter the name of a tag.')
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_reassign(self):
+        '''Test recipes move with their tags and ingredients'''
+        soup = self.sample_recipe('Soup')
+        stew = self.sample_recipe('Stew')
+        self.sample_recipe('Stew', self.other)
+
+        response = self.run_action(
+            'bulk_reassign', [soup, stew], user_email=self.other.email
+        )
+
+        self.assertContains(response, 'Moved 1 recipes, skipped 1')
+        soup.refresh_from_db()
+        self.assertEqual(soup.user, self.other)
+        self.assertEqual(soup.version, 2)
+        self.assertEqual(
+            {i.user for i in soup.ingredients.all()}, {self.other}
+        )
+        self.assertEqual(
+            sorted(i.name for i in soup.ingredients.all()), ['Pepper', 'Salt']
+        )
+        self.assertEqual(
+            set(IngredientPair.objects.values_list('user', 'count')),
+            {(self.user.pk, 1), (self.other.pk, 1)}
+        )
+
+    def test_bulk_reassign_unknown_user(self):
+        '''Test reassigning to an unknown email changes nothing'''
+        soup = self.sample_recipe('Soup')
+
+        response = self.run_action(
+            'bulk_reassign', [soup], user_email='nobody@b.com'
+        )
+
+        self.assertContains(response, 'Enter the email of an existing user.')
+        soup.refresh_from_db()
+        self.assertEqual(soup.user, self.user)
+
+    @override_settings(
+        ADMIN_BULK_SYNC_LIMIT=1, ADMIN_BULK_BATCH_SIZE=1, TASKS_EAGER=False
+    )
+    def test_large_selection_is_queued(self):
+        '''Test large selections run as a task reporting progress'''
+        soup = self.sample_recipe('Soup')
+        stew = self.sample_recipe('Stew')
+
+        response = self.run_action('bulk_delete', [soup, stew])
+
+        task = Task.objects.get()
+        self.assertContains(
+            response, f'Queued 2 recipes as task {task.pk}'
+        )
+        self.assertEqual(Recipe.objects.count(), 2)
+
+        taskqueue.run_pending()
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.DONE)
+        self.assertEqual((task.progress, task.progress_total), (2, 2))
+        self.assertEqual(Recipe.objects.count(), 0)
+
+        response = self.client.get(reverse('admin:core_task_changelist'))
+        self.assertContains(response, '2/2')
+
+    def test_tasks_cannot_be_deleted(self):
+        '''Test the task admin is read only, deletes included'''
+        task = Task.objects.create(name='core.tasks.refresh_recipe_summaries')
+
+        response = self.client.get(
+            reverse('admin:core_task_delete', args=[task.pk])
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Task.objects.filter(pk=task.pk).exists())
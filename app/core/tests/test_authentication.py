@@ -0,0 +1,182 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import AuthToken, RevokedToken
+
+
+TOKEN_URL = reverse('user:token')
+REVOKE_URL = reverse('user:token-revoke')
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class TokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.payload = {'email': 'test@recipe.com', 'password': 'testpass'}
+        self.user = get_user_model().objects.create_user(**self.payload)
+        self.client = APIClient()
+
+    def _login(self):
+        response = self.client.post(TOKEN_URL, self.payload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['token']
+
+    def _get(self, url, key):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return self.client.get(url)
+
+    def test_database_token_authenticates(self):
+        '''Test a fresh database token is accepted'''
+        key = self._login()
+
+        self.assertEqual(self._get(ME_URL, key).status_code, 200)
+        self.assertEqual(self._get(RECIPES_URL, key).status_code, 200)
+
+    def test_expired_database_token_rejected(self):
+        '''Test tokens older than AUTH_TOKEN_TTL are rejected'''
+        key = self._login()
+        AuthToken.objects.filter(key=key).update(
+            created=timezone.now() - timedelta(days=30)
+        )
+
+        response = self._get(ME_URL, key)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_per_login(self):
+        '''Test every login gets its own token and leaves the other
+        devices logged in'''
+        phone = self._login()
+        laptop = self._login()
+
+        self.assertNotEqual(laptop, phone)
+        self.assertEqual(self._get(ME_URL, phone).status_code, 200)
+        self.assertEqual(self._get(ME_URL, laptop).status_code, 200)
+
+    def test_login_drops_expired_tokens(self):
+        '''Test logging in removes the user's expired tokens only'''
+        old = self._login()
+        current = self._login()
+        AuthToken.objects.filter(key=old).update(
+            created=timezone.now() - timedelta(days=30)
+        )
+
+        self._login()
+
+        self.assertFalse(AuthToken.objects.filter(key=old).exists())
+        self.assertTrue(AuthToken.objects.filter(key=current).exists())
+
+    def test_revoke_database_token(self):
+        '''Test a revoked database token is rejected'''
+        key = self._login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        response = self.client.post(REVOKE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self._get(ME_URL, key).status_code, 401)
+
+    def test_revoke_logs_out_one_device(self):
+        '''Test revoking a token leaves the other devices logged in'''
+        phone = self._login()
+        laptop = self._login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {phone}')
+        self.client.post(REVOKE_URL)
+
+        self.assertEqual(self._get(ME_URL, phone).status_code, 401)
+        self.assertEqual(self._get(ME_URL, laptop).status_code, 200)
+
+    def test_purge_expired_tokens(self):
+        '''Test purge_deleted removes expired tokens'''
+        expired = self._login()
+        fresh = self._login()
+        AuthToken.objects.filter(key=expired).update(
+            created=timezone.now() - timedelta(days=30)
+        )
+
+        call_command('purge_deleted', pause=0)
+
+        self.assertFalse(AuthToken.objects.filter(key=expired).exists())
+        self.assertTrue(AuthToken.objects.filter(key=fresh).exists())
+
+
+@override_settings(
+    AUTH_TOKEN_MODE='signed',
+    AUTH_TOKEN_SIGNING_KEYS=['new-key', 'old-key'],
+)
+class SignedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.payload = {'email': 'test@recipe.com', 'password': 'testpass'}
+        self.user = get_user_model().objects.create_user(**self.payload)
+        self.client = APIClient()
+        self.key = self.client.post(TOKEN_URL, self.payload).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+    def test_signed_token_skips_token_table(self):
+        '''Test signed tokens authenticate without a token lookup'''
+        with self.assertNumQueries(1):
+            response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(AuthToken.objects.exists())
+
+    def test_signed_token_valid_after_key_rotation(self):
+        '''Test tokens signed with an older key are still accepted'''
+        with self.settings(AUTH_TOKEN_SIGNING_KEYS=['newer-key', 'new-key']):
+            response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_signed_token_unknown_key_rejected(self):
+        '''Test tokens signed with a retired key are rejected'''
+        with self.settings(AUTH_TOKEN_SIGNING_KEYS=['other-key']):
+            response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_signed_token_expires(self):
+        '''Test signed tokens expire after AUTH_TOKEN_TTL'''
+        with self.settings(AUTH_TOKEN_TTL=-1):
+            response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_signed_token(self):
+        '''Test a revoked signed token is rejected'''
+        response = self.client.post(REVOKE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_shared_between_processes(self):
+        '''Test revocations are stored in the database, not the local
+        cache of the process that revoked the token'''
+        self.client.post(REVOKE_URL)
+        cache.clear()
+
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+    def test_purge_expired_revocations(self):
+        '''Test purge_deleted forgets revocations of expired tokens'''
+        self.client.post(REVOKE_URL)
+        RevokedToken.objects.update(expires_at=timezone.now())
+
+        call_command('purge_deleted', pause=0)
+
+        self.assertFalse(RevokedToken.objects.exists())
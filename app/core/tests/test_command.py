@@ -1,6 +1,7 @@
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
@@ -11,15 +12,49 @@ class CommandTests(TestCase):
         '''Test waiting for db when db is available'''
 
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+            call_command('wait_for_db', database=['default'])
+            self.assertEqual(gi.return_value.cursor.call_count, 1)
 
     @patch('time.sleep', return_value=None)
     def test_wait_for_db(self, ts):
         '''Test waiting for db'''
 
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+            gi.return_value.cursor.side_effect = \
+                [OperationalError] * 5 + [MagicMock()]
+            call_command('wait_for_db', database=['default'])
+            self.assertEqual(gi.return_value.cursor.call_count, 6)
+            self.assertEqual(ts.call_count, 5)
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_backoff_is_bounded(self, ts):
+        '''Test retry delays grow exponentially up to the maximum'''
+
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            gi.return_value.cursor.side_effect = \
+                [OperationalError] * 10 + [MagicMock()]
+            with patch('random.uniform', side_effect=lambda a, b: b):
+                call_command(
+                    'wait_for_db', database=['default'],
+                    initial_delay=0.1, max_delay=1,
+                )
+
+        delays = [c.args[0] for c in ts.call_args_list]
+        self.assertEqual(delays[:4], [0.1, 0.2, 0.4, 0.8])
+        self.assertEqual(max(delays), 1)
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_timeout(self, ts):
+        '''Test the command fails once the timeout is exceeded'''
+
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            gi.return_value.cursor.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', database=['default'], timeout=0)
+
+    def test_wait_for_db_checks_migrations_and_cache(self):
+        '''Test the optional readiness checks pass on a migrated database'''
+        call_command(
+            'wait_for_db', database=['default'],
+            check_migrations=True, check_cache=True,
+        )
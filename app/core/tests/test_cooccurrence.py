@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Ingredient, IngredientPair, Recipe
+from core.purge import purge_recipes
+
+
+class IngredientPairTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass'
+        )
+        self.salt, self.pepper, self.oil = (
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Salt', 'Pepper', 'Oil')
+        )
+
+    def sample_recipe(self, title, *ingredients):
+        recipe = Recipe.objects.create(
+            user=self.user, title=title, time_minutes=5,
+            price_of_ingredient=1.00
+        )
+        recipe.ingredients.add(*ingredients)
+
+        return recipe
+
+    def counts(self):
+        return {
+            (pair.ingredient.name, pair.other.name): pair.count
+            for pair in IngredientPair.objects.select_related(
+                'ingredient', 'other'
+            )
+        }
+
+    def test_counts_follow_recipe_changes(self):
+        '''Test pair counts are updated as ingredients are linked'''
+        soup = self.sample_recipe('Soup', self.salt, self.pepper)
+        self.sample_recipe('Stew', self.salt, self.pepper, self.oil)
+
+        self.assertEqual(self.counts()[('Salt', 'Pepper')], 2)
+        self.assertEqual(self.counts()[('Pepper', 'Salt')], 2)
+        self.assertEqual(self.counts()[('Oil', 'Salt')], 1)
+
+        soup.ingredients.remove(self.pepper, self.oil)
+        self.assertEqual(self.counts()[('Salt', 'Pepper')], 1)
+
+        self.oil.recipe_set.add(soup)
+        self.assertEqual(self.counts()[('Salt', 'Oil')], 2)
+
+        soup.ingredients.clear()
+        self.assertEqual(self.counts()[('Salt', 'Oil')], 1)
+
+        soup.ingredients.set([self.salt, self.pepper])
+        soup.delete()
+        self.assertEqual(self.counts()[('Salt', 'Pepper')], 1)
+
+    def test_rebuild_matches_incremental_counts(self):
+        '''Test the rebuild command recomputes the same counts'''
+        self.sample_recipe('Soup', self.salt, self.pepper)
+        self.sample_recipe('Stew', self.salt, self.pepper, self.oil)
+        self.sample_recipe('Gone', self.salt, self.oil).delete()
+        expected = self.counts()
+
+        IngredientPair.objects.all().delete()
+        call_command('rebuild_ingredient_pairs', users=[self.user.pk])
+
+        self.assertEqual(self.counts(), expected)
+        self.assertEqual(len(expected), 6)
+
+    def test_deleting_user_uncounts_their_pairs(self):
+        '''Test deleting an account leaves no pair counts behind'''
+        other = get_user_model().objects.create_user('other@b.com', 'pass')
+        lime, chili = (
+            Ingredient.objects.create(user=other, name=name)
+            for name in ('Lime', 'Chili')
+        )
+        Recipe.objects.create(
+            user=other, title='Salsa', time_minutes=5,
+            price_of_ingredient=1.00
+        ).ingredients.add(lime, chili)
+        self.sample_recipe('Soup', self.salt, self.pepper)
+
+        self.user.soft_delete()
+
+        self.assertFalse(
+            IngredientPair.objects.filter(user=self.user).exists()
+        )
+        self.assertEqual(IngredientPair.objects.filter(user=other).count(), 2)
+
+    def test_purging_live_recipes_uncounts_their_pairs(self):
+        '''Test purging recipes that were not soft deleted first'''
+        soup = self.sample_recipe('Soup', self.salt, self.pepper)
+        self.sample_recipe('Stew', self.salt, self.pepper)
+
+        purge_recipes(Recipe.objects.filter(pk=soup.pk))
+
+        self.assertEqual(self.counts()[('Salt', 'Pepper')], 1)
@@ -0,0 +1,27 @@
+from unittest.mock import patch
+
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.test import TransactionTestCase
+
+
+class PersistentConnectionTests(TransactionTestCase):
+
+    def _request(self):
+        '''Simulate the connection handling of a single request'''
+        request_started.send(sender=self.__class__)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        request_finished.send(sender=self.__class__)
+
+    def test_connection_reused_across_requests(self):
+        '''Test the same connection serves consecutive requests'''
+        with patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 60}):
+            connection.close()
+            self._request()
+            first = connection.connection
+            self._request()
+
+            self.assertIsNotNone(first)
+            self.assertIs(connection.connection, first)
+            self.assertIsNotNone(connection.close_at)
@@ -0,0 +1,66 @@
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+
+
+HASHERS = [
+    'core.hashers.TunableArgon2PasswordHasher',
+    'core.hashers.TunablePBKDF2PasswordHasher',
+]
+
+
+@override_settings(
+    PASSWORD_HASHERS=HASHERS,
+    ARGON2_TIME_COST=1,
+    ARGON2_MEMORY_COST=256,
+    ARGON2_PARALLELISM=1,
+    PBKDF2_ITERATIONS=1000,
+)
+class PasswordHasherTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpassword',
+        )
+
+    def test_new_passwords_use_argon2(self):
+        '''Test passwords are hashed with the configured argon2 costs'''
+        self.assertTrue(self.user.password.startswith('argon2$'))
+        self.assertIn('m=256,t=1,p=1', self.user.password)
+
+    def test_pbkdf2_hash_upgraded_on_login(self):
+        '''Test an old PBKDF2 hash is replaced by argon2 on login'''
+        self.user.password = make_password(
+            'testpassword', hasher='pbkdf2_sha256'
+        )
+        self.user.save()
+
+        user = authenticate(
+            username='test@recipe.com',
+            password='testpassword',
+        )
+
+        self.assertEqual(user, self.user)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+
+    def test_rehash_on_login_after_cost_change(self):
+        '''Test changing the argon2 costs rehashes on the next login'''
+        with self.settings(ARGON2_TIME_COST=2):
+            user = authenticate(
+                username='test@recipe.com',
+                password='testpassword',
+            )
+
+        user.refresh_from_db()
+        self.assertIn('t=2', user.password)
+
+    def test_wrong_password_not_rehashed(self):
+        '''Test a failed login leaves the stored hash alone'''
+        old_hash = self.user.password
+        with self.settings(ARGON2_TIME_COST=2):
+            authenticate(username='test@recipe.com', password='wrong')
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, old_hash)
@@ -0,0 +1,91 @@
+import tempfile
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.test import TestCase, override_settings
+
+from core import health
+
+
+class HealthCheckTests(TestCase):
+
+    def setUp(self):
+        health.clear_readiness_cache()
+        self.media_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media_root.cleanup()
+        health.clear_readiness_cache()
+
+    def test_healthz(self):
+        '''Test the liveness probe answers without touching the database'''
+        with self.assertNumQueries(0):
+            response = self.client.get('/healthz')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    @override_settings(ALLOWED_HOSTS=[])
+    def test_healthz_skips_host_validation(self):
+        '''Test probes work for hosts outside of ALLOWED_HOSTS'''
+        response = self.client.get('/healthz', HTTP_HOST='10.0.0.1')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_readyz(self):
+        '''Test the readiness probe reports every dependency'''
+        response = self.client.get('/readyz')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'status': 'ok',
+            'checks': {'database': 'ok', 'cache': 'ok', 'media': 'ok'},
+        })
+
+    def test_readyz_database_down(self):
+        '''Test the readiness probe fails when the database is down'''
+        with patch.dict(health.READINESS_CHECKS, database=_raise):
+            response = self.client.get('/readyz')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'fail')
+        checks = response.json()['checks']
+        self.assertEqual(checks['database'], 'fail')
+        self.assertNotIn('10.0.0.5', response.content.decode())
+
+    def test_readyz_media_not_writable(self):
+        '''Test the readiness probe fails when media is not writable'''
+        # A path below a regular file can never be created
+        with tempfile.NamedTemporaryFile() as not_a_dir, \
+                override_settings(MEDIA_ROOT=f'{not_a_dir.name}/media'):
+            response = self.client.get('/readyz')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['media'], 'fail')
+
+    def test_readyz_checks_storage_in_use(self):
+        '''Test the media check goes through the configured storage'''
+        with patch.object(health.default_storage, 'save',
+                          side_effect=OSError('bucket not found')) as save:
+            response = self.client.get('/readyz')
+
+        self.assertTrue(save.called)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['media'], 'fail')
+
+    def test_readyz_result_cached(self):
+        '''Test repeated probes reuse the last result'''
+        self.client.get('/readyz')
+        with self.assertNumQueries(0):
+            response = self.client.get('/readyz')
+
+        self.assertEqual(response.status_code, 200)
+
+
+def _raise():
+    raise OperationalError('could not connect to server at 10.0.0.5')
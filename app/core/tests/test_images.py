@@ -0,0 +1,125 @@
+import io
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core import tasks
+from core.images import compute_placeholder
+from core.models import Recipe
+
+
+def image_bytes(color=(200, 30, 40), size=(400, 300)):
+    buffer = io.BytesIO()
+    image = Image.new('RGB', size, color)
+    # A small patch of another colour must not win the dominant colour
+    image.paste((10, 200, 10), (0, 0, 40, 40))
+    image.save(buffer, 'JPEG', quality=95)
+
+    return buffer.getvalue()
+
+
+class ComputePlaceholderTests(TestCase):
+
+    def test_compute_placeholder(self):
+        '''Test the placeholder is a tiny WebP and the colour dominant'''
+        placeholder, color = compute_placeholder(io.BytesIO(image_bytes()))
+
+        self.assertTrue(placeholder.startswith('data:image/webp;base64,'))
+        self.assertLess(len(placeholder), 500)
+        red, green, blue = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+        self.assertGreater(red, 180)
+        self.assertLess(green, 60)
+
+    @patch('core.images.PLACEHOLDER_FORMAT', 'JPEG')
+    @patch('core.images.PLACEHOLDER_MIME_TYPE', 'image/jpeg')
+    def test_compute_placeholder_without_webp(self):
+        '''Test the placeholder falls back to JPEG without libwebp'''
+        placeholder, _ = compute_placeholder(io.BytesIO(image_bytes()))
+
+        self.assertTrue(placeholder.startswith('data:image/jpeg;base64,'))
+
+
+class RecipeImageTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass'
+        )
+
+    def sample_recipe(self, title='Soup', **image_args):
+        recipe = Recipe.objects.create(
+            user=self.user, title=title, time_minutes=5,
+            price_of_ingredient=1.00
+        )
+        recipe.image.save(
+            f'{title}.jpg', ContentFile(image_bytes(**image_args))
+        )
+
+        return recipe
+
+    def test_process_recipe_image(self):
+        '''Test the task stores the placeholder and colour'''
+        recipe = self.sample_recipe()
+
+        tasks.process_recipe_image(recipe.pk)
+
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.image_placeholder.startswith('data:'))
+        self.assertRegex(recipe.image_color, r'^#[0-9a-f]{6}$')
+
+    def test_backfill_image_placeholders(self):
+        '''Test the backfill command fills in missing placeholders'''
+        red = self.sample_recipe('Red', color=(220, 20, 20))
+        blue = self.sample_recipe('Blue', color=(20, 20, 220))
+        Recipe.objects.create(
+            user=self.user, title='No image', time_minutes=5,
+            price_of_ingredient=1.00
+        )
+
+        out = io.StringIO()
+        call_command(
+            'backfill_image_placeholders', workers=2, batch_size=1,
+            stdout=out
+        )
+
+        self.assertIn('2 placeholders computed, 0 failed', out.getvalue())
+        red.refresh_from_db()
+        blue.refresh_from_db()
+        self.assertTrue(red.image_placeholder)
+        self.assertGreater(int(red.image_color[1:3], 16), 180)
+        self.assertGreater(int(blue.image_color[5:7], 16), 180)
+
+    def test_process_undecodable_image(self):
+        '''Test an image that cannot be decoded is marked as failed rather
+        than retried'''
+        recipe = self.sample_recipe()
+        recipe.image.save('broken.jpg', ContentFile(image_bytes()[:200]))
+
+        tasks.process_recipe_image(recipe.pk)
+
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.image_failed)
+        self.assertEqual(recipe.image_placeholder, '')
+
+    def test_process_decompression_bomb(self):
+        '''Test oversized images are marked as failed'''
+        recipe = self.sample_recipe()
+
+        with patch.object(Image, 'MAX_IMAGE_PIXELS', 100):
+            tasks.process_recipe_image(recipe.pk)
+
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.image_failed)
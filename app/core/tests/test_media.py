@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from rest_framework.test import APIClient
+
+from core import media
+from core.models import Recipe
+
+
+CONTENT = b'0123456789' * 10
+
+
+class ParseRangeTests(TestCase):
+
+    def test_parse_range(self):
+        '''Test parsing single byte ranges'''
+        self.assertEqual(media.parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(media.parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(media.parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(media.parse_range('bytes=50-500', 100), (50, 99))
+        self.assertIsNone(media.parse_range(None, 100))
+        self.assertIsNone(media.parse_range('bytes=0-1,5-6', 100))
+        with self.assertRaises(ValueError):
+            media.parse_range('bytes=100-', 100)
+
+
+class MediaViewTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.path = 'uploads/recipe/test.jpg'
+        os.makedirs(os.path.join(self.media_root, 'uploads/recipe'))
+        with open(os.path.join(self.media_root, self.path), 'wb') as f:
+            f.write(CONTENT)
+
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price_of_ingredient=1.00, image=self.path
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('media', args=[self.path])
+
+    def test_serve_file(self):
+        '''Test that the owner gets the file with cache headers'''
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertTrue(res['ETag'])
+
+    def test_requires_access(self):
+        '''Test that other users and unknown paths get a 404'''
+        other = get_user_model().objects.create_user('o@x.com', 'testpass')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_authenticate(self.user)
+        url = reverse('media', args=['uploads/recipe/missing.jpg'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.recipe.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_range_request(self):
+        '''Test that a single byte range returns partial content'''
+        res = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[10:20])
+        self.assertEqual(res['Content-Range'], 'bytes 10-19/100')
+
+        res = self.client.get(self.url, HTTP_RANGE='bytes=200-')
+        self.assertEqual(res.status_code, 416)
+
+    def test_conditional_requests(self):
+        '''Test If-None-Match and If-Modified-Since return 304'''
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+
+        mtime = os.stat(os.path.join(self.media_root, self.path)).st_mtime
+        res = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=http_date(mtime + 60)
+        )
+        self.assertEqual(res.status_code, 304)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='nginx')
+    def test_accel_redirect(self):
+        '''Test that nginx is told to serve the file'''
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res['X-Accel-Redirect'], '/protected-media/' + self.path
+        )
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='nginx')
+    def test_etag_from_stat(self):
+        '''Test the ETag is derived without reading the file and changes
+        with its mtime'''
+        full_path = os.path.join(self.media_root, self.path)
+        with patch('builtins.open', side_effect=AssertionError('read')):
+            etag = self.client.get(self.url)['ETag']
+
+        stat = os.stat(full_path)
+        os.utime(full_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        self.assertNotEqual(self.client.get(self.url)['ETag'], etag)
+
+    @override_settings(PUBLIC_CACHE_MAX_AGE=60, PUBLIC_CACHE_S_MAXAGE=86400)
+    def test_public_recipe_image(self):
+        '''Test that images of public recipes are served to anyone'''
+        client = APIClient()
+        self.assertEqual(client.get(self.url).status_code, 404)
+
+        self.recipe.is_public = True
+        self.recipe.save()
+        res = client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res['Cache-Control'], 'public, max-age=60, s-maxage=86400'
+        )
+        self.assertEqual(res['Surrogate-Key'], f'recipe-{self.recipe.id}')
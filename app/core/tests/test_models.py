@@ -1,5 +1,6 @@
 from unittest.mock import patch
 
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -61,6 +62,34 @@ class ModelTests(TestCase):
         self.assertEqual(str(tag), tag.name)
         # This will match __str__ form the model with tag.name
 
+    def test_tag_name_unique_per_user(self):
+        '''Test different users can have tags with the same name'''
+        user = sample_user()
+        other = sample_user(email='other@test.com')
+        models.Tag.objects.create(user=user, name='Vegan')
+        models.Tag.objects.create(user=other, name='Vegan')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.Tag.objects.create(user=user, name='Vegan')
+
+    def test_upsert_creates_then_returns_existing(self):
+        '''Test upsert inserts once and returns the existing row after'''
+        user = sample_user()
+        tag, created = models.Tag.objects.upsert(
+            ('user', 'name'), user=user, name='Vegan'
+        )
+        self.assertTrue(created)
+        self.assertIsNotNone(tag.pk)
+
+        with self.assertNumQueries(2):
+            same, created = models.Tag.objects.upsert(
+                ('user', 'name'), user=user, name='Vegan'
+            )
+
+        self.assertFalse(created)
+        self.assertEqual(same, tag)
+        self.assertEqual(models.Tag.objects.filter(user=user).count(), 1)
+
     def test_ingredient_str(self):
         '''Test the ingredient string representation'''
         ingredient = models.Ingredient.objects.create(
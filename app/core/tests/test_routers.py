@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import Tag
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class PrimaryReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        '''Test reads outside of a safe API request use the primary'''
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    def test_reads_use_replica_when_flagged(self):
+        '''Test reads are sent to a replica inside a safe API request'''
+        token = routers.read_from_replica.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(Tag), 'replica1')
+        finally:
+            routers.read_from_replica.reset(token)
+
+    def test_writes_use_primary(self):
+        '''Test writes always go to the primary'''
+        token = routers.read_from_replica.set(True)
+        try:
+            self.assertEqual(self.router.db_for_write(Tag), 'default')
+        finally:
+            routers.read_from_replica.reset(token)
+
+    def test_no_migrations_on_replica(self):
+        '''Test migrations only run against the primary'''
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaReadApiTests(TestCase):
+    '''Test routing against a separate replica database, which is not
+    kept in sync with the primary, so each read shows where it went'''
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpassword',
+        )
+        replica_user = get_user_model().objects.using('replica').create(
+            pk=self.user.pk, email=self.user.email
+        )
+        Tag.objects.create(user=self.user, name='On primary')
+        Tag.objects.using('replica').create(
+            user=replica_user, name='On replica'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tag_names(self, response):
+        return [tag['name'] for tag in response.data['results']]
+
+    def test_safe_request_reads_from_replica(self):
+        '''Test listing tags reads from the replica'''
+        response = self.client.get(TAGS_URL)
+
+        self.assertEqual(self.tag_names(response), ['On replica'])
+        self.assertFalse(routers.read_from_replica.get())
+
+    def test_reads_outside_requests_use_primary(self):
+        '''Test code outside of a safe request reads the primary'''
+        self.assertEqual(
+            list(Tag.objects.values_list('name', flat=True)), ['On primary']
+        )
+
+    def test_writes_and_reads_after_write_use_primary(self):
+        '''Test writes go to the primary and the user then reads it'''
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertTrue(Tag.objects.using('default').filter(
+            name='Vegan'
+        ).exists())
+        self.assertFalse(Tag.objects.using('replica').filter(
+            name='Vegan'
+        ).exists())
+        response = self.client.get(TAGS_URL)
+        self.assertEqual(
+            sorted(self.tag_names(response)), ['On primary', 'Vegan']
+        )
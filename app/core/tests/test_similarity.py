@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import bulk, similarity
+from core.models import Ingredient, Recipe, Tag
+
+
+def rounded(scores):
+    return [(pk, round(score, 2)) for pk, score in scores]
+
+
+class SimilarityIndexTests(TestCase):
+
+    def test_similar(self):
+        '''Test recipes are ranked by jaccard and cosine similarity'''
+        index = similarity.SimilarityIndex.build({
+            1: frozenset({1, 2, 3, 4}),
+            2: frozenset({1, 2, 3, 4}),
+            3: frozenset({1, 2}),
+            4: frozenset({1, 2, 3, 4, 5}),
+            5: frozenset({9}),
+            6: frozenset(),
+        }, stamp=None)
+
+        self.assertEqual(
+            rounded(index.similar(1, 'jaccard', 10)),
+            [(2, 1.0), (4, 0.8), (3, 0.5)]
+        )
+        self.assertEqual(
+            rounded(index.similar(1, 'cosine', 10)),
+            [(2, 1.0), (4, 0.89), (3, 0.71)]
+        )
+        self.assertEqual(index.similar(1, 'jaccard', 1), [(2, 1.0)])
+        self.assertEqual(index.similar(6, 'jaccard', 10), [])
+        self.assertEqual(index.similar(99, 'jaccard', 10), [])
+
+    def test_updated(self):
+        '''Test changed rows are replaced and removed ones dropped'''
+        index = similarity.SimilarityIndex.build({
+            1: frozenset({1, 2}),
+            2: frozenset({1, 2}),
+            3: frozenset({1}),
+        }, stamp=None)
+
+        index = index.updated({2: None, 3: frozenset({1, 2, 7})}, None)
+
+        self.assertEqual(rounded(index.similar(1, 'jaccard', 10)), [(3, 0.67)])
+
+
+class GetIndexTests(TestCase):
+
+    def setUp(self):
+        similarity.clear_indexes()
+        self.addCleanup(similarity.clear_indexes)
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+    def sample_recipe(self, title):
+        recipe = Recipe.objects.create(
+            user=self.user, title=title, time_minutes=5,
+            price_of_ingredient=1.00
+        )
+        recipe.tags.add(self.tag)
+
+        return recipe
+
+    def test_index_follows_changes(self):
+        '''Test the cached index picks up recipe changes'''
+        soup = self.sample_recipe('Soup')
+        stew = self.sample_recipe('Stew')
+        index = similarity.get_index(self.user)
+        self.assertEqual(index.similar(soup.pk), [(stew.pk, 1.0)])
+
+        self.assertIs(similarity.get_index(self.user), index)
+
+        stew.ingredients.add(self.salt)
+        self.assertEqual(
+            similarity.get_index(self.user).similar(soup.pk),
+            [(stew.pk, 0.5)]
+        )
+
+        stew.delete()
+        self.assertEqual(similarity.get_index(self.user).similar(soup.pk), [])
+
+    def test_index_drops_recipes_moved_away(self):
+        '''Test recipes moved to another user leave the cached index'''
+        soup = self.sample_recipe('Soup')
+        stew = self.sample_recipe('Stew')
+        similarity.get_index(self.user)
+        other = get_user_model().objects.create_user('other@b.com', 'pass')
+
+        bulk.reassign_recipes([stew.pk], other.pk)
+
+        self.assertEqual(similarity.get_index(self.user).similar(soup.pk), [])
@@ -0,0 +1,144 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+
+ME_URL = reverse('user:me')
+
+
+def recipe_detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class SoftDeleteTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Thai soup',
+            time_minutes=10,
+            price_of_ingredient=5.00,
+        )
+
+    def test_delete_recipe_is_soft(self):
+        '''Test deleting a recipe hides it but keeps the row'''
+        response = self.client.delete(recipe_detail_url(self.recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Recipe.objects.filter(pk=self.recipe.pk).exists())
+        recipe = Recipe.all_objects.get(pk=self.recipe.pk)
+        self.assertIsNotNone(recipe.deleted_at)
+
+        response = self.client.get(recipe_detail_url(self.recipe.id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleted_tag_hidden_from_recipe(self):
+        '''Test a soft deleted tag disappears from its recipes'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        tag.delete()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(list(self.recipe.tags.all()), [])
+        self.assertEqual(self.recipe.tag_names, [])
+
+    def test_name_reusable_after_delete(self):
+        '''Test a deleted tag name can be used again'''
+        Tag.objects.create(user=self.user, name='Vegan').delete()
+        tag, created = Tag.objects.upsert(
+            ('user', 'name'), user=self.user, name='Vegan'
+        )
+
+        self.assertTrue(created)
+        self.assertEqual(Tag.all_objects.filter(name='Vegan').count(), 2)
+
+    def test_delete_account(self):
+        '''Test deleting the account deactivates it and hides its data'''
+        Tag.objects.create(user=self.user, name='Vegan')
+        response = self.client.delete(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+
+
+class PurgeDeletedTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass'
+        )
+
+    def _recipe(self, user, title):
+        recipe = Recipe.objects.create(
+            user=user, title=title, time_minutes=10, price_of_ingredient=5
+        )
+        recipe.image = SimpleUploadedFile('image.jpg', b'data')
+        recipe.save()
+        return recipe
+
+    def test_purge_deleted_recipes(self):
+        '''Test purging removes deleted recipes, links and images only'''
+        kept = self._recipe(self.user, 'Kept')
+        deleted = self._recipe(self.user, 'Deleted')
+        deleted.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        image_path = deleted.image.path
+        deleted.delete()
+
+        call_command('purge_deleted', older_than=0, batch_size=1, pause=0)
+
+        self.assertFalse(Recipe.all_objects.filter(pk=deleted.pk).exists())
+        self.assertFalse(os.path.exists(image_path))
+        self.assertFalse(
+            Recipe.tags.through.objects.filter(recipe_id=deleted.pk).exists()
+        )
+        self.assertTrue(Recipe.objects.filter(pk=kept.pk).exists())
+        self.assertTrue(os.path.exists(kept.image.path))
+
+    def test_purge_respects_retention(self):
+        '''Test recently deleted rows are kept'''
+        recipe = self._recipe(self.user, 'Deleted')
+        recipe.delete()
+
+        call_command('purge_deleted', older_than=3600, pause=0)
+
+        self.assertTrue(Recipe.all_objects.filter(pk=recipe.pk).exists())
+
+    def test_purge_deleted_user(self):
+        '''Test purging removes a deleted user and everything they own'''
+        self._recipe(self.user, 'Soup')
+        Ingredient.objects.create(user=self.user, name='Lime')
+        self.user.soft_delete()
+
+        call_command('purge_deleted', older_than=0, batch_size=1, pause=0)
+
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        self.assertFalse(Recipe.all_objects.exists())
+        self.assertFalse(Ingredient.all_objects.exists())
@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Ingredient, Recipe, Tag
+
+
+class RecipeSummaryTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpass'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Thai soup',
+            time_minutes=10,
+            price_of_ingredient=5.00,
+        )
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.lime = Ingredient.objects.create(user=self.user, name='Lime')
+
+    def _stored(self):
+        return Recipe.objects.values(
+            'tag_names', 'ingredient_names', 'ingredient_count'
+        ).get(pk=self.recipe.pk)
+
+    def test_summary_updated_on_add_and_remove(self):
+        '''Test adding and removing relations updates the summary'''
+        self.recipe.tags.add(self.vegan)
+        self.recipe.ingredients.add(self.lime)
+
+        self.assertEqual(self._stored(), {
+            'tag_names': ['Vegan'],
+            'ingredient_names': ['Lime'],
+            'ingredient_count': 1,
+        })
+        self.assertEqual(self.recipe.tag_names, ['Vegan'])
+
+        self.recipe.tags.remove(self.vegan)
+        self.recipe.ingredients.clear()
+        self.assertEqual(self._stored(), {
+            'tag_names': [],
+            'ingredient_names': [],
+            'ingredient_count': 0,
+        })
+
+    def test_summary_updated_from_reverse_side(self):
+        '''Test changes made through the tag side update the recipe'''
+        self.vegan.recipe_set.add(self.recipe)
+        self.assertEqual(self._stored()['tag_names'], ['Vegan'])
+
+        self.vegan.recipe_set.clear()
+        self.assertEqual(self._stored()['tag_names'], [])
+
+    def test_summary_updated_on_rename_and_delete(self):
+        '''Test renaming and deleting a tag updates the recipe'''
+        self.recipe.tags.add(self.vegan)
+        self.vegan.name = 'Plant based'
+        self.vegan.save()
+        self.assertEqual(self._stored()['tag_names'], ['Plant based'])
+
+        self.vegan.delete()
+        self.assertEqual(self._stored()['tag_names'], [])
+
+    def test_summary_not_refreshed_without_rename(self):
+        '''Test saving a tag without changing its name leaves recipes be'''
+        self.recipe.tags.add(self.vegan)
+        updated_at = Recipe.objects.get(pk=self.recipe.pk).updated_at
+
+        Tag.objects.get(pk=self.vegan.pk).save()
+        self.vegan.name = 'Vegan'
+        self.vegan.save()
+
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).updated_at, updated_at
+        )
+
+    def test_rebuild_and_check_command(self):
+        '''Test the command detects and fixes stale summaries'''
+        self.recipe.ingredients.add(self.lime)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            ingredient_names=[], ingredient_count=0
+        )
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_recipe_summaries', check=True)
+
+        call_command('rebuild_recipe_summaries', batch_size=1)
+        call_command('rebuild_recipe_summaries', check=True)
+        self.assertEqual(self._stored()['ingredient_count'], 1)
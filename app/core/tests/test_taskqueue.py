@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import taskqueue
+from core.models import Task
+
+
+calls = []
+
+
+@taskqueue.task
+def record(value):
+    calls.append(value)
+
+
+@taskqueue.task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@override_settings(TASKS_EAGER=False, TASKS_RETRY_DELAY=10)
+class TaskQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_queues_task(self):
+        '''Test delay stores the task instead of running it'''
+        queued = record.delay('value')
+
+        self.assertEqual(calls, [])
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertEqual(queued.args, ['value'])
+
+    def test_run_pending(self):
+        '''Test queued tasks are run and marked done'''
+        queued = record.delay('value')
+
+        self.assertEqual(taskqueue.run_pending(), 1)
+        self.assertEqual(calls, ['value'])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.DONE)
+        self.assertEqual(queued.attempts, 1)
+
+    def test_future_tasks_not_claimed(self):
+        '''Test tasks are only claimed once they are due'''
+        queued = record.delay('later')
+        Task.objects.filter(pk=queued.pk).update(
+            run_at=timezone.now() + timedelta(minutes=5)
+        )
+
+        self.assertEqual(taskqueue.run_pending(), 0)
+
+    def test_failed_task_retried_with_backoff(self):
+        '''Test failing tasks are retried later, then marked failed'''
+        queued = explode.delay()
+        before = timezone.now()
+        taskqueue.run_pending()
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertIn('RuntimeError: boom', queued.last_error)
+        self.assertGreaterEqual(
+            queued.run_at, before + timedelta(seconds=10)
+        )
+
+        Task.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        taskqueue.run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    def test_retry_delay_capped(self):
+        '''Test the backoff doubles up to TASKS_MAX_RETRY_DELAY'''
+        with self.settings(TASKS_MAX_RETRY_DELAY=60):
+            delays = [taskqueue.retry_delay(n) for n in range(1, 6)]
+
+        self.assertEqual(delays, [10, 20, 40, 60, 60])
+
+    def test_stale_running_task_reclaimed(self):
+        '''Test tasks of a crashed worker are picked up again'''
+        queued = record.delay('value')
+        Task.objects.filter(pk=queued.pk).update(
+            status=Task.RUNNING,
+            updated_at=timezone.now() - timedelta(days=1),
+        )
+
+        self.assertEqual(taskqueue.run_pending(), 1)
+        self.assertEqual(calls, ['value'])
+
+    def test_stale_task_out_of_attempts_failed(self):
+        '''Test a task that keeps crashing its worker is not reclaimed'''
+        queued = explode.delay()
+        Task.objects.filter(pk=queued.pk).update(
+            status=Task.RUNNING,
+            attempts=2,
+            updated_at=timezone.now() - timedelta(days=1),
+        )
+
+        self.assertEqual(taskqueue.run_pending(), 0)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode(self):
+        '''Test delay runs the task right away in eager mode'''
+        self.assertIsNone(record.delay('now'))
+
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASKS_EAGER=False)
+class RunWorkerTests(TransactionTestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_worker_once(self):
+        '''Test the worker drains the queue with several threads'''
+        for value in range(5):
+            record.delay(value)
+
+        # SQLite's shared in-memory test database locks whole tables, so
+        # concurrent workers are only exercised on a real server
+        concurrency = 1 if connection.vendor == 'sqlite' else 2
+        call_command(
+            'run_worker', concurrency=concurrency, once=True,
+            poll_interval=0.01
+        )
+
+        self.assertEqual(sorted(calls), list(range(5)))
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 5)
@@ -0,0 +1,132 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.throttling import IPRateThrottle, SlidingWindowRateThrottle
+
+
+TOKEN_URL = reverse('user:token')
+TAGS_URL = reverse('recipe:tag-list')
+
+RATES = {
+    'REST_FRAMEWORK': {
+        'DEFAULT_THROTTLE_RATES': {
+            'test_ip': '3/min',
+            'login_ip': '100/min',
+            'login_account': '2/min',
+            'recipe_write_user': '2/min',
+        },
+    },
+}
+
+
+class ScopedView:
+    throttle_scope = 'test'
+
+
+class DefaultIdentThrottle(SlidingWindowRateThrottle):
+    rate_suffix = 'ip'
+
+
+@override_settings(**RATES)
+class SlidingWindowThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.request = APIRequestFactory().get('/')
+
+    def _allow(self):
+        throttle = IPRateThrottle()
+        return throttle, throttle.allow_request(self.request, ScopedView())
+
+    @patch('core.throttling.time.time', return_value=6000.0)
+    def test_requests_limited_within_window(self, now):
+        '''Test requests over the rate are rejected'''
+        results = [self._allow()[1] for _ in range(4)]
+
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_previous_window_weighted(self):
+        '''Test requests in the previous window count proportionally'''
+        with patch('core.throttling.time.time', return_value=6000.0):
+            for _ in range(3):
+                self._allow()
+
+        # Halfway into the next window half of the 3 requests still count
+        with patch('core.throttling.time.time', return_value=6090.0):
+            self.assertTrue(self._allow()[1])
+            throttle, allowed = self._allow()
+
+        self.assertFalse(allowed)
+        self.assertGreater(throttle.wait(), 0)
+        self.assertLessEqual(throttle.wait(), 30)
+
+    def test_view_without_rate_not_throttled(self):
+        '''Test scopes without a configured rate are not throttled'''
+        view = ScopedView()
+        view.throttle_scope = 'unknown'
+        throttle = IPRateThrottle()
+
+        for _ in range(10):
+            self.assertTrue(throttle.allow_request(self.request, view))
+
+    def test_default_ident(self):
+        '''Test the base class counts users by id and anonymous requests
+        by client IP'''
+        throttle = DefaultIdentThrottle()
+        self.request.user = AnonymousUser()
+        self.assertEqual(throttle.get_ident_key(self.request), '127.0.0.1')
+
+        self.request.user = get_user_model()(pk=7)
+        self.assertEqual(throttle.get_ident_key(self.request), 'user-7')
+
+
+@override_settings(**RATES)
+class ThrottledEndpointTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@recipe.com',
+            'testpassword',
+        )
+
+    def test_login_throttled_per_account(self):
+        '''Test repeated logins against one account are throttled'''
+        payload = {'email': 'test@recipe.com', 'password': 'wrong'}
+        for _ in range(2):
+            self.client.post(TOKEN_URL, payload)
+        response = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        self.assertIn('Retry-After', response)
+
+        other = {'email': 'other@recipe.com', 'password': 'wrong'}
+        response = self.client.post(TOKEN_URL, other)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_writes_throttled(self):
+        '''Test recipe writes are throttled but reads are not'''
+        self.client.force_authenticate(self.user)
+        for name in ('Vegan', 'Dessert'):
+            self.client.post(TAGS_URL, {'name': name})
+
+        response = self.client.post(TAGS_URL, {'name': 'Fruity'})
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+        response = self.client.get(TAGS_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,105 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class SlidingWindowRateThrottle(BaseThrottle):
+    '''Sliding window counter throttle.
+
+    Keeps a single integer counter per fixed window in the cache and
+    estimates the count over the last full window by weighting the
+    previous window's counter. A check costs an atomic add/incr and one
+    get, instead of reading and rewriting a list of timestamps.
+
+    The rate is looked up in DEFAULT_THROTTLE_RATES under
+    '<view.throttle_scope>_<rate_suffix>'. Views without a rate for it are
+    not throttled.
+    '''
+    rate_suffix = None
+
+    def get_ident_key(self, request):
+        '''Return what the requests are counted by, None to skip. By
+        default the user for authenticated requests, else the client IP'''
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+
+        return self.get_ident(request)
+
+    def get_rate(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return None, None
+        scope = f'{scope}_{self.rate_suffix}'
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return None, None
+        num, period = rate.split('/')
+        duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+        return scope, (int(num), duration)
+
+    def allow_request(self, request, view):
+        scope, rate = self.get_rate(view)
+        ident = self.get_ident_key(request)
+        if rate is None or ident is None:
+            return True
+
+        self.num_requests, self.duration = rate
+        cache = caches[settings.THROTTLE_CACHE]
+        now = time.time()
+        window = int(now // self.duration)
+        key = f'throttle:{scope}:{ident}:'
+
+        # add() is a no-op if the counter exists, so incr() never misses
+        cache.add(key + str(window), 0, self.duration * 2)
+        current = cache.incr(key + str(window))
+        previous = cache.get(key + str(window - 1), 0)
+
+        self.elapsed = now / self.duration - window
+        self.current, self.previous = current, previous
+        estimate = previous * (1 - self.elapsed) + current
+
+        return estimate <= self.num_requests
+
+    def wait(self):
+        '''Seconds until the estimate drops back under the limit'''
+        if self.current > self.num_requests or not self.previous:
+            return (1 - self.elapsed) * self.duration
+        needed = 1 - (self.num_requests - self.current) / self.previous
+
+        return max(needed - self.elapsed, 0) * self.duration
+
+
+class UserRateThrottle(SlidingWindowRateThrottle):
+    '''Throttle authenticated users by their id'''
+    rate_suffix = 'user'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+
+        return None
+
+
+class IPRateThrottle(SlidingWindowRateThrottle):
+    '''Throttle by client IP address'''
+    rate_suffix = 'ip'
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class AccountRateThrottle(SlidingWindowRateThrottle):
+    '''Throttle login attempts by the targeted account email'''
+    rate_suffix = 'account'
+
+    def get_ident_key(self, request):
+        email = request.data.get('email')
+        if not email:
+            return None
+
+        return str(email).strip().lower()
@@ -1,5 +1,13 @@
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
 from rest_framework import serializers
+from rest_framework.validators import UniqueTogetherValidator
 
+from core import storage
+from core.exceptions import PreconditionFailed
 from core.models import Tag, Ingredient, Recipe
 
 
@@ -8,8 +16,8 @@ class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = ('id', 'name')
-        read_only_fields = ('id', )
+        fields = ('id', 'name', 'version')
+        read_only_fields = ('id', 'version')
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -17,8 +25,8 @@ class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = ('id', 'name')
-        read_only_fields = ('id', )
+        fields = ('id', 'name', 'version')
+        read_only_fields = ('id', 'version')
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -32,15 +40,79 @@ class RecipeSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all()
     )
     # This ingredients, tags will only return ID/Primary Key
+    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
         model = Recipe
         fields = (
-            'id', 'title', 'ingredients', 'tags',
+            'id', 'user', 'title', 'ingredients', 'tags',
             'time_minutes', 'price_of_ingredient',
-            'link'
+            'link', 'tag_names', 'ingredient_names', 'ingredient_count',
+            'image_placeholder', 'image_color', 'image_failed', 'is_public',
+            'version'
         )
-        read_only_fields = ('id',)
+        read_only_fields = (
+            'id', 'tag_names', 'ingredient_names', 'ingredient_count',
+            'image_placeholder', 'image_color', 'image_failed', 'version'
+        )
+        validators = [
+            UniqueTogetherValidator(
+                queryset=Recipe.objects.all(),
+                fields=('user', 'title'),
+            ),
+        ]
+
+    def update(self, instance, validated_data):
+        '''Update the recipe in a single conditional UPDATE statement.
+
+        With an expected_version in the context (from If-Match) the update
+        only applies if the stored version still matches, otherwise
+        PreconditionFailed is raised. Tags and ingredients are replaced
+        with set(), which only inserts and deletes the changed links, in
+        the same transaction. The new version is read back from the row,
+        which the UPDATE keeps locked until the transaction ends.
+        '''
+        relations = {
+            name: validated_data.pop(name)
+            for name in ('tags', 'ingredients') if name in validated_data
+        }
+        expected_version = self.context.get('expected_version')
+        filters = {'pk': instance.pk}
+        if expected_version is not None:
+            filters['version'] = expected_version
+
+        validated_data['updated_at'] = timezone.now()
+        with transaction.atomic():
+            updated = Recipe.objects.filter(**filters).update(
+                version=F('version') + 1,
+                **validated_data
+            )
+            if not updated:
+                raise PreconditionFailed()
+
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            for name, value in relations.items():
+                getattr(instance, name).set(value)
+            instance.refresh_from_db(fields=['version', 'updated_at'])
+
+        return instance
+
+
+class RecipeCanMakeSerializer(RecipeSerializer):
+    '''Serialize a recipe with the number of ingredients it still needs'''
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('missing', )
+
+
+class RecipeSimilarSerializer(RecipeSerializer):
+    '''Serialize a recipe with its similarity to another one'''
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('similarity', )
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -49,6 +121,30 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class PublicRecipeSerializer(serializers.ModelSerializer):
+    '''Serialize a public recipe. Only uses the recipe row, tag and
+    ingredient names come from the denormalized summary columns'''
+    image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id', 'title', 'time_minutes', 'price_of_ingredient', 'link',
+            'image', 'image_placeholder', 'image_color', 'tag_names',
+            'ingredient_names', 'ingredient_count', 'version'
+        )
+        read_only_fields = fields
+
+    def get_image(self, recipe):
+        '''Link the image through the media view, not straight to storage.
+        Object storage URLs are signed and would expire while responses
+        are still in shared caches'''
+        if not recipe.image:
+            return None
+
+        return reverse('media', kwargs={'path': recipe.image.name})
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     '''Serializer for uploading images to recipe'''
 
@@ -56,3 +152,52 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'image')
         read_only_fields = ('id', )
+
+
+class RecipeUploadUrlSerializer(serializers.Serializer):
+    '''Serializer for requesting a direct image upload'''
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.ChoiceField(
+        choices=storage.IMAGE_CONTENT_TYPES
+    )
+
+
+class RecipeCompleteUploadSerializer(serializers.Serializer):
+    '''Serializer for attaching a directly uploaded image to a recipe'''
+    token = serializers.CharField()
+
+
+class TagCountSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='tag_id')
+    name = serializers.CharField(source='tag__name')
+    recipe_count = serializers.IntegerField()
+
+
+class IngredientCountSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient__name')
+    recipe_count = serializers.IntegerField()
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    '''Serializer for the statistics computed by core.stats'''
+    recipe_count = serializers.IntegerField()
+    avg_time_minutes = serializers.FloatField(allow_null=True)
+    total_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, allow_null=True
+    )
+    avg_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, allow_null=True
+    )
+    median_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, allow_null=True
+    )
+    tags = TagCountSerializer(many=True)
+    top_ingredients = IngredientCountSerializer(many=True)
+
+
+class RelatedIngredientSerializer(serializers.Serializer):
+    '''Serializer for an ingredient used together with another'''
+    id = serializers.IntegerField(source='other_id')
+    name = serializers.CharField(source='other.name')
+    recipe_count = serializers.IntegerField(source='count')
@@ -0,0 +1,185 @@
+import io
+
+import boto3
+import requests
+
+from PIL import Image
+
+from moto import mock_s3
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import storage
+from core.models import Recipe
+
+
+S3_SETTINGS = {
+    'DEFAULT_FILE_STORAGE': 'storages.backends.s3boto3.S3Boto3Storage',
+    'AWS_STORAGE_BUCKET_NAME': 'media',
+    'AWS_S3_REGION_NAME': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+}
+
+
+def upload_url_url(recipe_id):
+    return reverse('recipe:recipe-upload-url', args=[recipe_id])
+
+
+def complete_upload_url(recipe_id):
+    return reverse('recipe:recipe-complete-upload', args=[recipe_id])
+
+
+class DirectUploadTestMixin:
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price_of_ingredient=1.00
+        )
+
+    def request_upload(self, recipe=None):
+        return self.client.post(
+            upload_url_url((recipe or self.recipe).id),
+            {'filename': 'soup.jpg', 'content_type': 'image/jpeg'}
+        )
+
+
+class LocalStorageDirectUploadTests(DirectUploadTestMixin, TestCase):
+
+    def test_direct_upload_not_supported(self):
+        '''Test that local storage points clients at upload-image'''
+        res = self.request_upload()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(**S3_SETTINGS)
+class S3DirectUploadTests(DirectUploadTestMixin, TestCase):
+    '''Test direct uploads against an in-process S3 stand-in'''
+
+    def setUp(self):
+        mock = mock_s3()
+        mock.start()
+        self.addCleanup(mock.stop)
+        self.s3 = boto3.client(
+            's3',
+            region_name='us-east-1',
+            aws_access_key_id='testing',
+            aws_secret_access_key='testing',
+        )
+        self.s3.create_bucket(Bucket='media')
+        super().setUp()
+
+    def upload(self, upload):
+        content = io.BytesIO()
+        Image.new('RGB', (10, 10), (255, 0, 0)).save(content, 'JPEG')
+        return requests.post(
+            upload['url'],
+            data=upload['fields'],
+            files={'file': ('soup.jpg', content.getvalue())},
+        )
+
+    def test_direct_upload(self):
+        '''Test uploading to the bucket and attaching it to the recipe'''
+        res = self.request_upload()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        key = res.data['fields']['key']
+        self.assertTrue(key.startswith('uploads/recipe/'))
+        self.assertTrue(key.endswith('.jpg'))
+
+        self.assertEqual(self.upload(res.data).status_code, 204)
+        res = self.client.post(
+            complete_upload_url(self.recipe.id), {'token': res.data['token']}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, key)
+        self.assertEqual(self.recipe.version, 2)
+        self.assertIn('media.s3.amazonaws.com', res.data['image'])
+        obj = self.s3.get_object(Bucket='media', Key=key)
+        self.assertEqual(obj['ContentType'], 'image/jpeg')
+        self.assertEqual(self.recipe.image_color[:3], '#fe')
+
+    def test_storage_location_prefixes_key(self):
+        '''Test the bucket key includes the storage location'''
+        media = S3Boto3Storage(location='site')
+        upload = storage.create_upload(
+            'uploads/recipe/soup.jpg', 'image/jpeg', 'recipe-1', media
+        )
+
+        self.assertEqual(
+            upload['fields']['key'], 'site/uploads/recipe/soup.jpg'
+        )
+        self.assertEqual(self.upload(upload).status_code, 204)
+        self.assertEqual(
+            storage.complete_upload(upload['token'], 'recipe-1', media),
+            'uploads/recipe/soup.jpg'
+        )
+
+    def test_complete_before_upload(self):
+        '''Test that a token is rejected until the object exists'''
+        token = self.request_upload().data['token']
+
+        res = self.client.post(
+            complete_upload_url(self.recipe.id), {'token': token}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_token_is_bound_to_recipe(self):
+        '''Test that a token cannot attach the upload to another recipe'''
+        other = Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=5,
+            price_of_ingredient=1.00
+        )
+        upload = self.request_upload().data
+        self.upload(upload)
+
+        res = self.client.post(
+            complete_upload_url(other.id), {'token': upload['token']}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(
+            complete_upload_url(self.recipe.id), {'token': 'bogus'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_content_type(self):
+        '''Test that only image uploads can be requested'''
+        res = self.client.post(
+            upload_url_url(self.recipe.id),
+            {'filename': 'evil.html', 'content_type': 'text/html'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_media_redirects_to_signed_url(self):
+        '''Test that the media view redirects to the bucket'''
+        upload = self.request_upload().data
+        self.upload(upload)
+        self.client.post(
+            complete_upload_url(self.recipe.id), {'token': upload['token']}
+        )
+        key = upload['fields']['key']
+
+        res = self.client.get(reverse('media', args=[key]))
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        self.assertIn('Signature=', res['Location'])
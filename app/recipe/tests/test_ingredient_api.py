@@ -5,7 +5,7 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
 
 # from recipe.serializers import IngredientSerializer
 
@@ -14,6 +14,11 @@ INGREDIENTS_URL = reverse('recipe:ingredient-list')
 # reverse('app:url name')
 
 
+def related_url(ingredient_id):
+    '''Return URL for the ingredients used with an ingredient'''
+    return reverse('recipe:ingredient-related', args=[ingredient_id])
+
+
 class PublicIngredientsApiTests(TestCase):
     '''Test the publically available ingredients API'''
 
@@ -85,3 +90,25 @@ class PrivateIngredientsApiTests(TestCase):
         response = self.client.post(INGREDIENTS_URL, payload)
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_related_ingredients(self):
+        '''Test listing the ingredients most often used with another'''
+        salt, pepper, oil = (
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Salt', 'Pepper', 'Oil')
+        )
+        for title, ingredients in (('Soup', [salt, pepper]),
+                                   ('Stew', [salt, pepper, oil])):
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5,
+                price_of_ingredient=1.00
+            )
+            recipe.ingredients.add(*ingredients)
+
+        response = self.client.get(related_url(salt.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'id': pepper.id, 'name': 'Pepper', 'recipe_count': 2},
+            {'id': oil.id, 'name': 'Oil', 'recipe_count': 1},
+        ])
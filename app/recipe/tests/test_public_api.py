@@ -0,0 +1,182 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import surrogate
+from core.models import Recipe, Tag
+
+
+PUBLIC_RECIPES_URL = reverse('recipe:public-recipe-list')
+
+purged = []
+
+
+def record_purge(keys):
+    purged.append(keys)
+
+
+def public_detail_url(recipe_id):
+    return reverse('recipe:public-recipe-detail', args=[recipe_id])
+
+
+class PublicRecipeApiTests(TestCase):
+    '''Test the unauthenticated public recipe API'''
+
+    def setUp(self):
+        surrogate.public_recipes.clear()
+        self.addCleanup(surrogate.public_recipes.clear)
+        purged.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price_of_ingredient=1.00, is_public=True
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        self.private = Recipe.objects.create(
+            user=self.user, title='Secret', time_minutes=5,
+            price_of_ingredient=1.00
+        )
+
+    def test_list_public_recipes(self):
+        '''Test that anyone can list public recipes, cacheably'''
+        res = self.client.get(PUBLIC_RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['title'] for r in res.data['results']], ['Soup']
+        )
+        self.assertEqual(res.data['results'][0]['tag_names'], ['Vegan'])
+        self.assertNotIn('user', res.data['results'][0])
+        self.assertTrue(res['Cache-Control'].startswith('public'))
+        self.assertEqual(
+            res['Surrogate-Key'], f'recipes recipe-{self.recipe.id}'
+        )
+
+    def test_retrieve_public_recipe(self):
+        '''Test retrieving a public recipe, then from the hot cache'''
+        res = self.client.get(public_detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Surrogate-Key'], f'recipe-{self.recipe.id}')
+        self.assertEqual(res['ETag'], '"%d"' % res.data['version'])
+
+        with self.assertNumQueries(0):
+            res = self.client.get(public_detail_url(self.recipe.id))
+        self.assertEqual(res.data['title'], 'Soup')
+
+    def test_private_recipe_not_found(self):
+        '''Test that private recipes are not served'''
+        res = self.client.get(public_detail_url(self.private.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('Cache-Control', res)
+
+    def test_read_only(self):
+        '''Test that public recipes cannot be changed'''
+        res = self.client.patch(
+            public_detail_url(self.recipe.id), {'title': 'Mine'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    @override_settings(
+        PUBLIC_CACHE_PURGE='recipe.tests.test_public_api.record_purge'
+    )
+    def test_update_purges_caches(self):
+        '''Test that an update drops the cached copies of the recipe'''
+        self.client.get(public_detail_url(self.recipe.id))
+        owner = APIClient()
+        owner.force_authenticate(self.user)
+
+        res = owner.patch(
+            reverse('recipe:recipe-detail', args=[self.recipe.id]),
+            {'is_public': False}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(['recipes', f'recipe-{self.recipe.id}'], purged)
+        res = self.client.get(public_detail_url(self.recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(
+        PUBLIC_CACHE_PURGE='recipe.tests.test_public_api.record_purge'
+    )
+    def test_deleted_account_purges_public_recipes(self):
+        '''Test deleting the owner's account drops cached public copies'''
+        self.client.get(public_detail_url(self.recipe.id))
+
+        self.user.soft_delete()
+
+        self.assertIn(['recipes', f'recipe-{self.recipe.id}'], purged)
+        res = self.client.get(public_detail_url(self.recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(
+        PUBLIC_CACHE_PURGE='recipe.tests.test_public_api.record_purge'
+    )
+    def test_create_purges_public_list(self):
+        '''Test that a new public recipe purges the cached list'''
+        owner = APIClient()
+        owner.force_authenticate(self.user)
+
+        res = owner.post(reverse('recipe:recipe-list'), {
+            'title': 'Salad', 'time_minutes': 5,
+            'price_of_ingredient': '1.00', 'is_public': True,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn(['recipes', f'recipe-{res.data["id"]}'], purged)
+
+    @override_settings(
+        PUBLIC_CACHE_PURGE='recipe.tests.test_public_api.record_purge'
+    )
+    def test_private_recipe_change_not_purged(self):
+        '''Test writes to private recipes purge nothing'''
+        owner = APIClient()
+        owner.force_authenticate(self.user)
+
+        res = owner.patch(
+            reverse('recipe:recipe-detail', args=[self.private.id]),
+            {'title': 'Still secret'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(purged, [])
+
+    @override_settings(
+        PUBLIC_CACHE_PURGE='recipe.tests.test_public_api.record_purge'
+    )
+    def test_public_recipe_change_keeps_list_key(self):
+        '''Test editing a public recipe purges its own key only, the list
+        pages showing it are tagged with that key too'''
+        owner = APIClient()
+        owner.force_authenticate(self.user)
+
+        res = owner.patch(
+            reverse('recipe:recipe-detail', args=[self.recipe.id]),
+            {'title': 'Broth'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(purged, [[f'recipe-{self.recipe.id}']])
+
+    def test_image_linked_through_media_view(self):
+        '''Test public image URLs do not expire while cached, unlike the
+        signed URLs of object storage'''
+        Recipe.objects.filter(pk=self.recipe.pk).update(image='ab/soup.jpg')
+        storage = Recipe._meta.get_field('image').storage
+
+        with patch.object(storage, 'url',
+                          return_value='https://bucket/soup.jpg?Signature=x'):
+            res = self.client.get(public_detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['image'], '/media/ab/soup.jpg')
@@ -1,5 +1,6 @@
 import tempfile  # this create dummy files
 import os
+from unittest.mock import patch
 
 from PIL import Image
 
@@ -12,7 +13,7 @@ from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
 
-from recipe.serializers import RecipeDetailSerializer  # , RecipeSerializer
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
@@ -24,6 +25,16 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+BATCH_URL = reverse('recipe:recipe-batch')
+STATS_URL = reverse('recipe:recipe-stats')
+CAN_MAKE_URL = reverse('recipe:recipe-can-make')
+
+
+def similar_url(recipe_id):
+    '''Return URL for the recipes similar to a recipe'''
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
 def recipe_detail_url(recipe_id):
     """Return recipe detail URL"""
     return reverse('recipe:recipe-detail', args=[recipe_id])
@@ -90,6 +101,21 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # self.assertEqual(response.data, serializer.data)
 
+    def test_list_queries_do_not_grow_with_recipes(self):
+        '''Test tags and ingredients are loaded for the page at once'''
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        for number in range(10):
+            recipe = sample_recipe(user=self.user, title=f'Soup {number}')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        # count, recipes, tags, ingredients
+        with self.assertNumQueries(4):
+            response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_recipe_limited_to_user(self):
         '''Test retrieving recipes for user'''
         user2 = get_user_model().objects.create_user(
@@ -136,6 +162,18 @@ class PrivateRecipeApiTest(TestCase):
         # test the VALUES is matching with the recipe key's VALUES or not.
         # We get the values of recipe by getattr()
 
+    def test_create_recipe_duplicate_title(self):
+        '''Test recipe titles are unique per user'''
+        sample_recipe(user=self.user, title='Test recipe')
+        payload = {
+            'title': 'Test recipe',
+            'time_minutes': 30,
+            'price_of_ingredient': 500.00
+        }
+        response = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_create_recipe_with_tags(self):
         '''Test creating recipe with tags'''
         tag1 = sample_tag(user=self.user, name='Tag 1')
@@ -217,6 +255,100 @@ class PrivateRecipeApiTest(TestCase):
         # we cannot change partially in PUT
         # if we donot fill a field in put request it will set null
 
+    def test_retrieve_recipe_etag(self):
+        '''Test the recipe version is returned as ETag'''
+        recipe = sample_recipe(user=self.user)
+        response = self.client.get(recipe_detail_url(recipe.id))
+
+        self.assertEqual(response['ETag'], f'"{recipe.version}"')
+
+    def test_update_recipe_if_match(self):
+        '''Test an update with a current If-Match header succeeds'''
+        recipe = sample_recipe(user=self.user)
+        response = self.client.patch(
+            recipe_detail_url(recipe.id),
+            {'title': 'Chicken tikka'},
+            HTTP_IF_MATCH=f'"{recipe.version}"',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Chicken tikka')
+        self.assertEqual(recipe.version, 2)
+        self.assertEqual(response['ETag'], '"2"')
+
+    def test_update_recipe_stale_if_match(self):
+        '''Test an update based on an old version is rejected'''
+        recipe = sample_recipe(user=self.user)
+        recipe.title = 'Changed elsewhere'
+        recipe.save()
+
+        response = self.client.patch(
+            recipe_detail_url(recipe.id),
+            {'title': 'Chicken tikka'},
+            HTTP_IF_MATCH='"1"',
+        )
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_412_PRECONDITION_FAILED,
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Changed elsewhere')
+
+    def test_update_returns_stored_version(self):
+        '''Test the version is read back after a concurrent write'''
+        recipe = sample_recipe(user=self.user)
+        Recipe.objects.filter(pk=recipe.pk).update(version=5)
+        serializer = RecipeSerializer(
+            recipe, data={'title': 'Chicken tikka'}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+
+        serializer.save()
+
+        self.assertEqual(serializer.data['version'], 6)
+
+    def test_failed_relation_update_rolled_back(self):
+        '''Test the version bump is undone if the relations fail'''
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(self.user)
+
+        with patch('core.signals.refresh_summaries',
+                   side_effect=RuntimeError):
+            response = client.patch(
+                recipe_detail_url(recipe.id),
+                {'title': 'Chicken tikka', 'tags': [tag.id]},
+            )
+
+        self.assertEqual(response.status_code, 500)
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.title, recipe.version), ('Sample recipe', 1))
+        self.assertFalse(recipe.tags.exists())
+
+    def test_update_recipe_tags_diffed(self):
+        '''Test unchanged tag links are kept when tags are replaced'''
+        recipe = sample_recipe(user=self.user)
+        kept = sample_tag(user=self.user, name='Kept')
+        removed = sample_tag(user=self.user, name='Removed')
+        added = sample_tag(user=self.user, name='Added')
+        recipe.tags.add(kept, removed)
+        through = Recipe.tags.through.objects
+        kept_link = through.get(recipe=recipe, tag=kept).pk
+
+        self.client.patch(
+            recipe_detail_url(recipe.id),
+            {'tags': [kept.id, added.id]},
+        )
+
+        self.assertEqual(through.get(recipe=recipe, tag=kept).pk, kept_link)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Kept', 'Added'},
+        )
+
     def test_filter_recipes_by_tags(self):
         '''Test returning recipes with specific tags'''
         '''
@@ -265,6 +397,150 @@ class PrivateRecipeApiTest(TestCase):
         self.assertNotIn(serializer3.data, response.data)
         '''
 
+    def test_batch_retrieve(self):
+        '''Test fetching several recipes by id in request order'''
+        first = sample_recipe(user=self.user, title='First')
+        second = sample_recipe(user=self.user, title='Second')
+        first.tags.add(sample_tag(user=self.user))
+        second.ingredients.add(sample_ingredient(user=self.user))
+        other_user = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'password123'
+        )
+        other = sample_recipe(user=other_user)
+
+        ids = f'{second.id},{first.id},{other.id},999999'
+        with self.assertNumQueries(3):
+            res = self.client.get(BATCH_URL, {'ids': ids})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'],
+            RecipeDetailSerializer([second, first], many=True).data
+        )
+        self.assertEqual(res.data['missing'], [other.id, 999999])
+
+    def test_batch_invalid_ids(self):
+        '''Test that malformed or too many ids are rejected'''
+        res = self.client.get(BATCH_URL, {'ids': '1,two'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        ids = ','.join(str(n) for n in range(1, 52))
+        res = self.client.get(BATCH_URL, {'ids': ids})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recipe_stats(self):
+        '''Test the aggregate statistics of the user's recipes'''
+        vegan = sample_tag(user=self.user, name='Vegan')
+        salt = sample_ingredient(user=self.user, name='Salt')
+        pepper = sample_ingredient(user=self.user, name='Pepper')
+        for title, minutes, price in (('A', 10, 1), ('B', 20, 3),
+                                      ('C', 60, 10)):
+            recipe = sample_recipe(
+                user=self.user, title=title, time_minutes=minutes,
+                price_of_ingredient=price
+            )
+            recipe.ingredients.add(salt)
+        recipe.tags.add(vegan)
+        recipe.ingredients.add(pepper)
+        sample_recipe(user=self.user, title='Gone').delete()
+        other_user = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'password123'
+        )
+        sample_recipe(user=other_user, price_of_ingredient=500)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 3)
+        self.assertEqual(res.data['avg_time_minutes'], 30)
+        self.assertEqual(res.data['total_price'], '14.00')
+        self.assertEqual(res.data['median_price'], '3.00')
+        self.assertEqual(
+            res.data['tags'],
+            [{'id': vegan.id, 'name': 'Vegan', 'recipe_count': 1}]
+        )
+        self.assertEqual(
+            [(i['name'], i['recipe_count'])
+             for i in res.data['top_ingredients']],
+            [('Salt', 3), ('Pepper', 1)]
+        )
+
+    def test_recipe_stats_cache_invalidated_on_write(self):
+        '''Test cached statistics are recomputed after a recipe changes'''
+        recipe = sample_recipe(user=self.user, price_of_ingredient=2)
+        sample_recipe(user=self.user, title='Other', price_of_ingredient=4)
+        self.assertEqual(self.client.get(STATS_URL).data['median_price'],
+                         '3.00')
+
+        with self.assertNumQueries(1):
+            self.client.get(STATS_URL)
+
+        self.client.patch(
+            recipe_detail_url(recipe.id), {'price_of_ingredient': 6}
+        )
+        self.assertEqual(self.client.get(STATS_URL).data['median_price'],
+                         '5.00')
+
+        recipe.delete()
+        self.assertEqual(self.client.get(STATS_URL).data['recipe_count'], 1)
+
+    def test_can_make(self):
+        '''Test listing recipes whose ingredients are mostly at hand'''
+        salt = sample_ingredient(user=self.user, name='Salt')
+        egg = sample_ingredient(user=self.user, name='Egg')
+        milk = sample_ingredient(user=self.user, name='Milk')
+        omelette = sample_recipe(user=self.user, title='Omelette')
+        omelette.ingredients.add(salt, egg)
+        pancake = sample_recipe(user=self.user, title='Pancake')
+        pancake.ingredients.add(egg, milk, salt)
+        sample_recipe(user=self.user, title='Nothing')
+
+        res = self.client.get(CAN_MAKE_URL, {
+            'ingredients': f'{salt.id},{egg.id}',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r['title'], r['missing']) for r in res.data['results']],
+            [('Omelette', 0)]
+        )
+
+        res = self.client.get(CAN_MAKE_URL, {
+            'ingredients': f'{salt.id},{egg.id}', 'max_missing': 1,
+        })
+        self.assertEqual(
+            [(r['title'], r['missing']) for r in res.data['results']],
+            [('Omelette', 0), ('Pancake', 1)]
+        )
+
+        res = self.client.get(CAN_MAKE_URL, {'ingredients': 'salt'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_similar_recipes(self):
+        '''Test listing the recipes most similar to a recipe'''
+        vegan = sample_tag(user=self.user, name='Vegan')
+        salt = sample_ingredient(user=self.user, name='Salt')
+        egg = sample_ingredient(user=self.user, name='Egg')
+        omelette = sample_recipe(user=self.user, title='Omelette')
+        omelette.tags.add(vegan)
+        omelette.ingredients.add(salt, egg)
+        frittata = sample_recipe(user=self.user, title='Frittata')
+        frittata.ingredients.add(salt, egg)
+        soup = sample_recipe(user=self.user, title='Soup')
+        soup.ingredients.add(salt)
+        sample_recipe(user=self.user, title='Unrelated')
+
+        res = self.client.get(similar_url(omelette.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r['title'], round(r['similarity'], 2)) for r in res.data],
+            [('Frittata', 0.67), ('Soup', 0.33)]
+        )
+
+        res = self.client.get(similar_url(omelette.id), {'metric': 'dice'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class RecipeImageUploadsTests(TestCase):
     '''tests for image uploads'''
@@ -296,6 +572,8 @@ class RecipeImageUploadsTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertTrue(self.recipe.image_placeholder)
+        self.assertEqual(self.recipe.image_color, '#000000')
 
     def test_upload_image_bad_request(self):
         '''Test uploading an invalid image'''
@@ -0,0 +1,159 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import bulk, sync
+from core.models import Ingredient, Recipe, Tag
+
+
+SYNC_URL = reverse('recipe:sync')
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncApiTests(TestCase):
+    '''Test the incremental sync endpoint'''
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None):
+        params = {'since': since} if since else {}
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return res.data
+
+    def test_login_required(self):
+        '''Test that authentication is required for sync'''
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_initial_sync_returns_live_rows(self):
+        '''Test that a sync without cursor returns the user's live rows'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Gone').delete()
+        other = get_user_model().objects.create_user('o@x.com', 'testpass')
+        Tag.objects.create(user=other, name='Other')
+
+        data = self.sync()
+
+        self.assertEqual([t['id'] for t in data['tags']], [tag.id])
+        self.assertEqual(data['deleted_tags'], [])
+        self.assertFalse(data['reset'])
+        self.assertFalse(data['has_more'])
+
+    def test_sync_returns_changes_since_cursor(self):
+        '''Test that only changed and deleted rows follow a cursor'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        gone = Tag.objects.create(user=self.user, name='Gone')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price_of_ingredient=1.00
+        )
+        cursor = self.sync()['next']
+
+        data = self.sync(cursor)
+        self.assertEqual(data['tags'], [])
+        self.assertEqual(data['recipes'], [])
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        gone.delete()
+        data = self.sync(data['next'])
+
+        self.assertEqual([t['name'] for t in data['tags']], ['Vegetarian'])
+        self.assertEqual(data['deleted_tags'], [gone.id])
+        self.assertEqual(data['recipes'], [])
+
+        recipe.tags.add(tag)
+        data = self.sync(data['next'])
+
+        self.assertEqual([r['id'] for r in data['recipes']], [recipe.id])
+        self.assertEqual(data['recipes'][0]['tag_names'], ['Vegetarian'])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_sync_pages_through_changes(self):
+        '''Test that large change sets are split over several pages'''
+        names = ['Tag %d' % i for i in range(5)]
+        for name in names:
+            Tag.objects.create(user=self.user, name=name)
+
+        seen = []
+        data = self.sync()
+        seen += [t['name'] for t in data['tags']]
+        while data['has_more']:
+            data = self.sync(data['next'])
+            seen += [t['name'] for t in data['tags']]
+
+        self.assertEqual(seen, names)
+
+    def test_sync_queries_do_not_grow_with_recipes(self):
+        '''Test recipe tags and ingredients are loaded for the page at once'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        lime = Ingredient.objects.create(user=self.user, name='Lime')
+        for number in range(20):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Soup {number}', time_minutes=5,
+                price_of_ingredient=1.00
+            )
+            recipe.tags.add(tag)
+            recipe.ingredients.add(lime)
+
+        # tags, ingredients, recipes and their tags and ingredients
+        with self.assertNumQueries(5):
+            data = self.sync()
+
+        self.assertEqual(len(data['recipes']), 20)
+        self.assertEqual(data['recipes'][0]['tags'], [tag.id])
+
+    def test_expired_cursor_resets(self):
+        '''Test that a cursor older than the retention forces a reset'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        issued_at = timezone.now() - datetime.timedelta(days=365)
+        cursor = sync.encode_cursor(
+            issued_at, {'tags': (timezone.now(), tag.id)}
+        )
+
+        data = self.sync(cursor)
+
+        self.assertTrue(data['reset'])
+        self.assertEqual([t['id'] for t in data['tags']], [tag.id])
+
+    def test_recipes_moved_away_reset_cursor(self):
+        '''Test that moving recipes to another user forces a reset'''
+        moved = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price_of_ingredient=1.00
+        )
+        kept = Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=5,
+            price_of_ingredient=1.00
+        )
+        cursor = self.sync()['next']
+        other = get_user_model().objects.create_user('o@x.com', 'testpass')
+
+        bulk.reassign_recipes([moved.pk], other.pk)
+        self.user.refresh_from_db()
+        data = self.sync(cursor)
+
+        self.assertTrue(data['reset'])
+        self.assertEqual([r['id'] for r in data['recipes']], [kept.id])
+        self.assertFalse(self.sync(data['next'])['reset'])
+
+    def test_invalid_cursor(self):
+        '''Test that a malformed cursor is rejected'''
+        res = self.client.get(SYNC_URL, {'since': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
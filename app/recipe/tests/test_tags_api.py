@@ -79,6 +79,29 @@ class PrivateTagsApiTests(TestCase):
         ).exists()
         self.assertTrue(exists)
 
+    def test_create_tag_idempotent(self):
+        '''Test creating an existing tag returns it instead of failing'''
+        tag = Tag.objects.create(user=self.user, name='Simple')
+        response = self.client.post(TAGS_URL, {'name': 'Simple'})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['id'], tag.id)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_create_tag_name_used_by_other_user(self):
+        '''Test users can create a tag another user already has'''
+        user2 = get_user_model().objects.create_user(
+            'other@recipe.com',
+            'testpass'
+        )
+        Tag.objects.create(user=user2, name='Simple')
+        response = self.client.post(TAGS_URL, {'name': 'Simple'})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(
+            Tag.objects.filter(user=self.user, name='Simple').exists()
+        )
+
     def test_create_tag_invalid(self):
         '''Test creating a new tag with invalid payload'''
         payload = {'name': ''}
@@ -1,11 +1,25 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import Count, F, Q
+from django.http import Http404
+from django.utils import timezone
+
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import viewsets, mixins, status
 # Mixins are to override the default viewsets
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 
-from core.models import Tag, Ingredient, Recipe
+from core import similarity, stats, storage, surrogate, sync, tasks
+from core.authentication import ExpiringTokenAuthentication
+from core.mixins import ReplicaReadMixin, ThrottleWritesMixin, \
+                        VersionETagMixin
+from core.models import Tag, Ingredient, IngredientPair, Recipe, \
+                        recipe_image_file_path
+from core.throttling import IPRateThrottle, UserRateThrottle
 
 from recipe import serializers
 
@@ -14,12 +28,16 @@ from . pagination import CustomPagination
 
 # TO reduce code repeating we write this base viewset.
 # From where we will inherite our tags, ingredient viewsets
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(ReplicaReadMixin,
+                            ThrottleWritesMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     '''Base viewset for user owned recipe attributes like, tags, ingredients'''
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (ExpiringTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
+    throttle_classes = (UserRateThrottle, IPRateThrottle)
+    throttle_scope = 'recipe_write'
     pagination_class = CustomPagination
 
     def get_queryset(self):
@@ -29,15 +47,22 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(
+                recipe__isnull=False,
+                recipe__deleted_at__isnull=True,
+            )
 
         return queryset.filter(
             user=self.request.user
         ).order_by('-name').distinct()
 
     def perform_create(self, serializer):
-        '''Create a new tag'''
-        serializer.save(user=self.request.user)
+        '''Create a new tag, or return the existing one with that name'''
+        serializer.instance, _ = self.queryset.model.objects.upsert(
+            ('user', 'name'),
+            user=self.request.user,
+            **serializer.validated_data
+        )
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -50,15 +75,36 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     '''Manage ingridients in the database'''
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    related_limit = 20
 
+    @action(methods=['GET'], detail=True)
+    def related(self, request, pk=None):
+        '''Return the ingredients most often used with this one'''
+        ingredient = self.get_object()
+        pairs = IngredientPair.objects.filter(
+            ingredient=ingredient,
+            other__deleted_at__isnull=True,
+        ).select_related('other').order_by('-count')[:self.related_limit]
 
-class RecipeViewset(viewsets.ModelViewSet):
+        return Response(
+            serializers.RelatedIngredientSerializer(pairs, many=True).data
+        )
+
+
+class RecipeViewset(ReplicaReadMixin,
+                    ThrottleWritesMixin,
+                    VersionETagMixin,
+                    viewsets.ModelViewSet):
     '''Manage recipes in the database'''
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
+    throttle_classes = (UserRateThrottle, IPRateThrottle)
+    throttle_scope = 'recipe_write'
     pagination_class = CustomPagination
+    batch_max_ids = 50
+    similar_max_limit = 50
 
     def _params_to_ints(self, qs):
         '''Convert a list of string IDs to a list of integers'''
@@ -77,21 +123,158 @@ class RecipeViewset(viewsets.ModelViewSet):
             ingredients_ids = self._params_to_ints(ingredients)
             queryset = queryset.filter(ingredients__id__in=ingredients_ids)
 
-        return queryset.filter(user=self.request.user)
+        queryset = queryset.filter(user=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            # Serializers list the tag and ingredient ids of each recipe
+            queryset = queryset.prefetch_related('tags', 'ingredients')
+
+        return queryset
 
     def get_serializer_class(self):
         '''Return appropriate serializer class'''
-        if self.action == 'retrieve':
+        if self.action in ('retrieve', 'batch'):
             return serializers.RecipeDetailSerializer
 
+        elif self.action == 'stats':
+            return serializers.RecipeStatsSerializer
+
+        elif self.action == 'can_make':
+            return serializers.RecipeCanMakeSerializer
+
+        elif self.action == 'similar':
+            return serializers.RecipeSimilarSerializer
+
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
 
+        elif self.action == 'upload_url':
+            return serializers.RecipeUploadUrlSerializer
+
+        elif self.action == 'complete_upload':
+            return serializers.RecipeCompleteUploadSerializer
+
         return self.serializer_class
 
     def perform_create(self, serializer):
         '''Create a new recipe'''
         serializer.save(user=self.request.user)
+        surrogate.recipes_changed([serializer.instance.pk], was_public=[])
+
+    def perform_update(self, serializer):
+        was_public = serializer.instance.is_public
+        serializer.save()
+        surrogate.recipes_changed(
+            [serializer.instance.pk],
+            was_public=[serializer.instance.pk] if was_public else [],
+        )
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        surrogate.recipes_changed(
+            [instance.pk],
+            was_public=[instance.pk] if instance.is_public else [],
+        )
+
+    @action(methods=['GET'], detail=False)
+    def batch(self, request):
+        '''Return the recipes with the given ids in request order, and the
+        ids that do not exist or belong to someone else'''
+        try:
+            ids = self._params_to_ints(request.query_params.get('ids', ''))
+        except ValueError:
+            raise ValidationError({'ids': ['Expected comma separated ids.']})
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > self.batch_max_ids:
+            raise ValidationError(
+                {'ids': [f'At most {self.batch_max_ids} ids are allowed.']}
+            )
+
+        recipes = self.queryset.filter(
+            user=request.user, pk__in=ids
+        ).prefetch_related('tags', 'ingredients')
+        recipes = {recipe.pk: recipe for recipe in recipes}
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in recipes],
+        })
+
+    @action(methods=['GET'], detail=False, url_path='can-make')
+    def can_make(self, request):
+        '''Return recipes that need no more than max_missing ingredients
+        beyond the given ones, those missing the fewest first'''
+        try:
+            ids = self._params_to_ints(
+                request.query_params.get('ingredients', '')
+            )
+            max_missing = int(request.query_params.get('max_missing', 0))
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': ['Expected comma separated ids.']}
+            )
+
+        # One grouped query, the max_missing filter becomes a HAVING
+        queryset = self.queryset.filter(
+            user=request.user, ingredient_count__gt=0
+        ).annotate(
+            missing=F('ingredient_count') - Count(
+                'ingredients',
+                filter=Q(
+                    ingredients__in=ids,
+                    ingredients__deleted_at__isnull=True,
+                ),
+            )
+        ).filter(
+            missing__lte=max_missing
+        ).order_by('missing', 'title').prefetch_related('tags', 'ingredients')
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        '''Return the user's recipes sharing the most tags and ingredients
+        with this one, by jaccard (default) or cosine similarity'''
+        recipe = self.get_object()
+        metric = request.query_params.get('metric', 'jaccard')
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if metric not in similarity.METRICS:
+            raise ValidationError({'metric': [
+                f'Expected one of {", ".join(similarity.METRICS)}.'
+            ]})
+        if not 0 < limit <= self.similar_max_limit:
+            raise ValidationError({'limit': [
+                f'Expected a number from 1 to {self.similar_max_limit}.'
+            ]})
+
+        scores = similarity.get_index(request.user).similar(
+            recipe.pk, metric, limit
+        )
+        recipes = self.queryset.filter(
+            user=request.user, pk__in=[pk for pk, _ in scores]
+        ).prefetch_related('tags', 'ingredients').in_bulk()
+        results = []
+        for recipe_id, score in scores:
+            if recipe_id in recipes:
+                recipes[recipe_id].similarity = score
+                results.append(recipes[recipe_id])
+
+        return Response(self.get_serializer(results, many=True).data)
+
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        '''Return aggregate statistics over the user's recipes'''
+        serializer = self.get_serializer(stats.get_stats(request.user))
+
+        return Response(serializer.data)
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
@@ -103,7 +286,12 @@ class RecipeViewset(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            # Cleared until process_recipe_image has seen the new image
+            serializer.save(
+                image_placeholder='', image_color='', image_failed=False
+            )
+            surrogate.recipes_changed([recipe.pk])
+            tasks.process_recipe_image.delay(recipe.pk)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -113,3 +301,192 @@ class RecipeViewset(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(methods=['POST'], detail=True, url_path='upload-url')
+    def upload_url(self, request, pk=None):
+        '''Return a pre-signed URL to upload an image straight to storage'''
+        recipe = self.get_object()
+        if not storage.supports_direct_upload():
+            return Response(
+                {'detail': 'Direct uploads are not supported, '
+                           'use upload-image instead.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = storage.create_upload(
+            recipe_image_file_path(recipe, serializer.data['filename']),
+            serializer.data['content_type'],
+            owner=f'recipe:{recipe.pk}',
+        )
+
+        return Response(upload, status=status.HTTP_200_OK)
+
+    @action(methods=['POST'], detail=True, url_path='complete-upload')
+    def complete_upload(self, request, pk=None):
+        '''Attach an image uploaded through upload-url to the recipe'''
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            recipe.image = storage.complete_upload(
+                serializer.validated_data['token'],
+                owner=f'recipe:{recipe.pk}',
+            )
+        except storage.InvalidUpload as exc:
+            raise ValidationError({'token': [str(exc)]})
+
+        recipe.image_placeholder = recipe.image_color = ''
+        recipe.image_failed = False
+        recipe.save(update_fields=[
+            'image', 'image_placeholder', 'image_color', 'image_failed'
+        ])
+        surrogate.recipes_changed([recipe.pk])
+        tasks.process_recipe_image.delay(recipe.pk)
+
+        return Response(
+            serializers.RecipeImageSerializer(
+                recipe, context=self.get_serializer_context()
+            ).data,
+            status=status.HTTP_200_OK
+        )
+
+
+class PublicRecipeViewSet(VersionETagMixin, viewsets.ReadOnlyModelViewSet):
+    '''Read only access to public recipes for anyone.
+
+    Responses do not depend on who asks, so they are marked cacheable by
+    shared caches and tagged with surrogate keys, which lets a CDN purge
+    exactly the recipes that changed. Single recipes are also kept in a
+    small in-process cache.
+    '''
+    serializer_class = serializers.PublicRecipeSerializer
+    queryset = Recipe.objects.filter(is_public=True).order_by('-id')
+    authentication_classes = ()
+    permission_classes = (AllowAny, )
+    pagination_class = CustomPagination
+
+    def get_serializer_context(self):
+        # Without the request image URLs stay relative, so the cached
+        # payloads do not depend on the host that was asked
+        context = super().get_serializer_context()
+        context.pop('request', None)
+
+        return context
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            recipe_id = int(kwargs['pk'])
+        except ValueError:
+            raise Http404()
+
+        data = surrogate.public_recipes.get(recipe_id)
+        if data is None:
+            data = self.get_serializer(self.get_object()).data
+            surrogate.public_recipes.set(recipe_id, data)
+
+        return Response(data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if response.status_code == status.HTTP_200_OK:
+            response['Cache-Control'] = (
+                f'public, max-age={settings.PUBLIC_CACHE_MAX_AGE}, '
+                f's-maxage={settings.PUBLIC_CACHE_S_MAXAGE}'
+            )
+            response['Surrogate-Key'] = ' '.join(self.get_surrogate_keys(
+                response.data
+            ))
+
+        return response
+
+    def get_surrogate_keys(self, data):
+        if self.action == 'retrieve':
+            return [surrogate.recipe_key(data['id'])]
+
+        return [surrogate.PUBLIC_RECIPES_KEY] + [
+            surrogate.recipe_key(recipe['id']) for recipe in data['results']
+        ]
+
+
+class SyncView(APIView):
+    '''Return the tags, ingredients and recipes changed since a cursor.
+
+    Without a cursor everything is returned. Each page holds the changed
+    rows and the ids of deleted rows, plus the cursor for the next call.
+    A cursor older than the soft delete retention can no longer see every
+    deletion, so the client is told to reset and sent everything again.
+    So is a cursor from before recipes were moved to another user, which
+    leave no tombstone behind.
+    Reads always go to the primary, as a lagging replica could make the
+    cursor skip over rows.
+    '''
+    authentication_classes = (ExpiringTokenAuthentication, )
+    permission_classes = (IsAuthenticated, )
+    sources = (
+        ('tags', Tag, serializers.TagSerializer),
+        ('ingredients', Ingredient, serializers.IngredientSerializer),
+        ('recipes', Recipe, serializers.RecipeSerializer),
+    )
+
+    def get_positions(self, since):
+        '''Return (positions, reset) for the since cursor'''
+        if not since:
+            return {}, False
+
+        try:
+            issued_at, positions = sync.decode_cursor(since)
+        except sync.InvalidCursor as exc:
+            raise ValidationError({'since': [str(exc)]})
+
+        retention = datetime.timedelta(
+            seconds=settings.SOFT_DELETE_RETENTION
+        )
+        if issued_at < timezone.now() - retention:
+            return {}, True
+        reset_at = self.request.user.sync_reset_at
+        # The move may have committed a little after reset_at was taken
+        settle = datetime.timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+        if reset_at is not None and issued_at < reset_at + settle:
+            return {}, True
+
+        return positions, False
+
+    def get(self, request):
+        positions, reset = self.get_positions(
+            request.query_params.get('since')
+        )
+        until = sync.settled_until(settings.SYNC_SETTLE_SECONDS)
+        data = {'reset': reset, 'has_more': False}
+
+        for key, model, serializer_class in self.sources:
+            queryset = model.all_objects.filter(user=request.user)
+            if model is Recipe:
+                # Recipes are serialized with their tag and ingredient ids
+                queryset = queryset.prefetch_related('tags', 'ingredients')
+            position = positions.get(key)
+            if position is None:
+                # A client starting from scratch needs no tombstones
+                queryset = queryset.filter(deleted_at__isnull=True)
+            rows, has_more = sync.changes_since(
+                queryset, position, until, settings.SYNC_PAGE_SIZE
+            )
+            if rows:
+                positions[key] = (rows[-1].updated_at, rows[-1].pk)
+
+            data[key] = serializer_class(
+                [row for row in rows if row.deleted_at is None],
+                many=True,
+                context={'request': request},
+            ).data
+            data['deleted_' + key] = [
+                row.pk for row in rows if row.deleted_at is not None
+            ]
+            data['has_more'] = data['has_more'] or has_more
+
+        data['next'] = sync.encode_cursor(timezone.now(), positions)
+
+        return Response(data)
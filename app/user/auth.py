@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib import auth
+from django.db import close_old_connections
+
+
+class PoolSaturated(Exception):
+    '''Raised when the login pool has no free worker or queue slot'''
+
+
+class BoundedExecutor:
+    '''Thread pool that rejects work once max_workers + max_queue tasks
+    are pending, instead of queueing them without bound'''
+
+    def __init__(self, max_workers, max_queue=0):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='login',
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        return future
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_login_executor():
+    '''Return the process wide login pool, creating it on first use'''
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = BoundedExecutor(
+                settings.LOGIN_POOL_WORKERS,
+                settings.LOGIN_POOL_QUEUE,
+            )
+
+    return _executor
+
+
+def _authenticate(request, email, password):
+    '''Run django.contrib.auth.authenticate on a pool thread, which has
+    its own database connection, expired like a request's one'''
+    close_old_connections()
+    try:
+        return auth.authenticate(request, email=email, password=password)
+    finally:
+        close_old_connections()
+
+
+def authenticate(request, email, password):
+    '''Return the user matching the credentials, or None.
+
+    Goes through AUTHENTICATION_BACKENDS, and so sends user_login_failed
+    and upgrades outdated hashes, on the bounded login pool so login
+    bursts cannot tie up every request worker. Raises PoolSaturated when
+    the pool is full. With LOGIN_POOL_WORKERS = 0 it runs inline.
+    '''
+    if not settings.LOGIN_POOL_WORKERS:
+        return auth.authenticate(request, email=email, password=password)
+
+    future = get_login_executor().submit(
+        _authenticate, request, email, password
+    )
+    return future.result()
@@ -1,7 +1,10 @@
-from django.contrib.auth import get_user_model, authenticate
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.utils.translation import ugettext_lazy as _
 
-from rest_framework import serializers
+from rest_framework import exceptions, serializers
+
+from user import auth
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -49,11 +52,13 @@ class AuthTokenSerializer(serializers.Serializer):
         email = attrs.get('email')
         password = attrs.get('password')
 
-        user = authenticate(
-            request=self.context.get('request'),
-            username=email,
-            password=password
-        )
+        try:
+            user = auth.authenticate(
+                self.context.get('request'), email, password
+            )
+        except auth.PoolSaturated:
+            # Shed load rather than let logins queue up on every worker
+            raise exceptions.Throttled(wait=settings.LOGIN_POOL_RETRY_AFTER)
         if not user:
             message = _('Unable to authenticate with provided credentials')
             raise serializers.ValidationError(message, code='authentication')
@@ -0,0 +1,143 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model, user_login_failed
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import auth
+
+
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+
+class BoundedExecutorTests(TestCase):
+
+    def test_rejects_work_when_full(self):
+        '''Test tasks beyond workers + queue are rejected'''
+        executor = auth.BoundedExecutor(max_workers=1, max_queue=1)
+        release = threading.Event()
+        running = executor.submit(release.wait)
+        queued = executor.submit(release.wait)
+
+        with self.assertRaises(auth.PoolSaturated):
+            executor.submit(release.wait)
+
+        release.set()
+        running.result()
+        queued.result()
+        self.assertTrue(executor.submit(lambda: True).result())
+
+    def test_sheds_once_workers_busy(self):
+        '''Test nothing is queued by default'''
+        executor = auth.BoundedExecutor(max_workers=1)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        executor.submit(release.wait)
+
+        with self.assertRaises(auth.PoolSaturated):
+            executor.submit(release.wait)
+
+
+@override_settings(LOGIN_POOL_WORKERS=1)
+class LoginPoolApiTests(TransactionTestCase):
+    '''Test logins are isolated from other requests by the login pool.
+
+    Logins run on pool threads with their own database connections, which
+    cannot see the data of a TestCase transaction.
+    '''
+
+    def setUp(self):
+        self.payload = {'email': 'test@recipeapp.com', 'password': 'testpass'}
+        self.user = get_user_model().objects.create_user(**self.payload)
+        self.executor = auth.BoundedExecutor(max_workers=1)
+        patcher = patch('user.auth._executor', self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def test_login_uses_pool(self):
+        '''Test logging in works through the pool'''
+        threads = []
+        authenticate = auth.auth.authenticate
+
+        def record(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return authenticate(*args, **kwargs)
+
+        with patch('user.auth.auth.authenticate', record):
+            response = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('token', response.data)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('login'))
+
+    def test_failed_login_signal_sent(self):
+        '''Test wrong credentials go through the auth backends'''
+        failed = []
+
+        def receiver(credentials, **kwargs):
+            failed.append(credentials['email'])
+
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        response = self.client.post(
+            TOKEN_URL, {**self.payload, 'password': 'wrong'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(failed, [self.payload['email']])
+
+    def test_inactive_user_rejected(self):
+        '''Test inactive users cannot log in'''
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requests_served_while_logins_saturate_pool(self):
+        '''Test other requests complete while a login holds the pool, and
+        further logins are rejected with 429 instead of waiting'''
+        started = threading.Event()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        authenticate = auth.auth.authenticate
+
+        def slow_authenticate(*args, **kwargs):
+            started.set()
+            release.wait(10)
+            return authenticate(*args, **kwargs)
+
+        responses = []
+
+        def login():
+            responses.append(APIClient().post(TOKEN_URL, self.payload))
+
+        with patch('user.auth.auth.authenticate', slow_authenticate):
+            slow_login = threading.Thread(target=login)
+            slow_login.start()
+            self.assertTrue(started.wait(10))
+
+            response = self.client.post(TOKEN_URL, self.payload)
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+            self.assertEqual(response['Retry-After'], '1')
+
+            self.client.force_authenticate(self.user)
+            response = self.client.get(ME_URL)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(slow_login.is_alive())
+
+            release.set()
+            slow_login.join(10)
+
+        self.assertEqual(responses[0].status_code, status.HTTP_200_OK)
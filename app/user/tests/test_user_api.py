@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework.test import APIClient
@@ -20,6 +21,8 @@ class PublicUserApiTests(TestCase):
     '''Test the users API (public)'''
 
     def setUp(self):
+        # Reset the signup and login throttles
+        cache.clear()
         self.client = APIClient()
 
     def test_create_valid_user_success(self):
@@ -1,27 +1,63 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
+from core.authentication import ExpiringTokenAuthentication, issue_token, \
+                                revoke_token
+from core.mixins import ReplicaReadMixin
+from core.throttling import AccountRateThrottle, IPRateThrottle
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 
 class CreateUserView(generics.CreateAPIView):
     '''Create a new user in the system'''
     serializer_class = UserSerializer
+    throttle_classes = (IPRateThrottle, )
+    throttle_scope = 'signup'
 
 
 class CreateTokenView(ObtainAuthToken):
     '''Create a new auth token for user'''
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (IPRateThrottle, AccountRateThrottle)
+    throttle_scope = 'login'
 
+    def post(self, request, *args, **kwargs):
+        '''Issue an expiring token for this device'''
+        serializer = self.serializer_class(
+            data=request.data,
+            context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        key, expires_at = issue_token(serializer.validated_data['user'])
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+        return Response({'token': key, 'expires_at': expires_at})
+
+
+class RevokeTokenView(APIView):
+    '''Revoke the token used to authenticate this request'''
+    authentication_classes = (ExpiringTokenAuthentication, )
+    permission_classes = (permissions.IsAuthenticated, )
+
+    def post(self, request):
+        revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ManageUserView(ReplicaReadMixin,
+                     generics.RetrieveUpdateDestroyAPIView):
     '''Manage the authenticated user'''
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication, )
+    authentication_classes = (ExpiringTokenAuthentication, )
     permission_classes = (permissions.IsAuthenticated, )
 
     def get_object(self):
         '''Retrive and return authenticated user'''
         return self.request.user
+
+    def perform_destroy(self, instance):
+        '''Deactivate the account, its data is purged in the background'''
+        instance.soft_delete()